@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# Load test for the HTTP service (core.server), run without a window.
+#
+#   python -m benchmarks.load [--users 8] [--size 1k] [--clients 32] [--requests 4000]
+#
+# Registers synthetic users (see benchmarks.run) in a temporary directory,
+# starts the server on a free local port in this process, and has --clients
+# keep-alive connections send a mix of reads and saves across the users.
+# Reports the overall request rate and p50/p99 latency per kind of request.
+# Client and server share one process, so the numbers are a floor.
+
+from benchmarks.run import SIZES, SEED, NAMES, generate_records, write_user
+from core.accounts import get_accounts
+from core.backends import STORAGE_ENV
+from core.dates import format_date, format_month
+from core.server import LedgerServer
+from core.store import get_store
+
+# Share of requests of each kind
+MIX = [('total', 0.4), ('day', 0.25), ('month', 0.15), ('duplicates', 0.1), ('save', 0.1)]
+
+
+def make_request(kind, username, rng, first, last, months):
+    """
+    Returns (method, path, body) for a random request of a kind
+    """
+    date = format_date(rng.randint(first, last))
+    month = format_month(rng.choice(months))
+    base = f"/users/{username}"
+    if kind == 'total':
+        return 'GET', f"{base}/total?month={month}", None
+    if kind == 'day':
+        return 'GET', f"{base}/day?date={date}", None
+    if kind == 'month':
+        return 'GET', f"{base}/month?month={month}", None
+    if kind == 'duplicates':
+        return 'POST', f"{base}/duplicates", {'date': date, 'expenses': rng.sample(NAMES, 5)}
+    entries = [{'expense': f"Load {rng.random():.12f}", 'amount': str(rng.randint(1, 999))}]
+    return 'POST', f"{base}/transactions", {'date': date, 'entries': entries, 'budget': 10 ** 9}
+
+
+async def send(reader, writer, method, path, body):
+    """
+    Send one request on a kept-alive connection. Returns the status code.
+    """
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n".encode('latin-1')
+        + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, number, count, users, first, last, months, timings, errors):
+    """
+    Send count requests on one connection, recording latency per kind
+    """
+    rng = random.Random(SEED + number)
+    kinds, weights = zip(*MIX)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for _ in range(count):
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = make_request(kind, rng.choice(users), rng, first, last, months)
+            start = time.perf_counter()
+            status = await send(reader, writer, method, path, body)
+            timings[kind].append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors[kind] = errors.get(kind, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(users, label, clients, requests, workers):
+    """
+    Set up the users, serve them and run the clients. Returns the results dict.
+    """
+    records, first, last = generate_records(SIZES[label])
+    months = sorted({record['month_key'] for record in records})
+    accounts = get_accounts()
+    usernames = [f"load_{i}" for i in range(users)]
+    for username in usernames:
+        accounts.register(username, 'benchmark')
+        write_user(username, records, os.environ[STORAGE_ENV])
+
+    server = await LedgerServer(workers).start('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    # Open every store first, so the timings are of requests, not loading
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(None, get_store, username) for username in usernames
+    ))
+
+    timings = {kind: [] for kind, _ in MIX}
+    errors = {}
+    per_client = max(1, requests // clients)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, number, per_client, usernames, first, last, months, timings, errors)
+        for number in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+
+    results = {'requests': per_client * clients, 'seconds': elapsed, 'requests_per_s': per_client * clients / elapsed}
+    for kind, values in timings.items():
+        values.sort()
+        if values:
+            results[kind] = {
+                'count': len(values),
+                'errors': errors.get(kind, 0),
+                'p50_ms': values[len(values) // 2],
+                'p99_ms': values[min(len(values) - 1, int(len(values) * 0.99))],
+            }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the ledger HTTP service")
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--size', choices=list(SIZES), default='1k', help="transactions per user")
+    parser.add_argument('--clients', type=int, default=32, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--workers', type=int, default=8, help="server worker threads")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    os.environ[STORAGE_ENV] = args.storage
+    workdir = tempfile.mkdtemp(prefix='tracker-load-')
+    original_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run_load(args.users, args.size, args.clients, args.requests, args.workers))
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{results['requests']} requests in {results['seconds']:.2f} s: {results['requests_per_s']:.0f} requests/s")
+    print(f"  {'request':<14}{'n':>7}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind, _ in MIX:
+        if kind in results:
+            result = results[kind]
+            print(f"  {kind:<14}{result['count']:>7}{result['errors']:>8}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'storage': args.storage, 'users': args.users, 'size': args.size,
+                       'clients': args.clients, 'results': results}, f, indent=2)
@@ -0,0 +1,226 @@
+from datetime import date as Date
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+# Benchmarks for the ledger logic behind the screens (core.ledger), run
+# without a window.
+#
+#   python -m benchmarks.run [--sizes 1k,100k,1m] [--storage json|sqlite] [--json out.json]
+#
+# Each size gets a synthetic user whose transactions are spread over several
+# years, generated from a fixed seed so every run sees the same ledger. The
+# database files are written to a temporary directory, never to database/.
+# Every operation is timed on its own (throughput, p50 and p99 latency), then
+# run once more under tracemalloc for its peak memory, so the tracing doesn't
+# slow the timed runs.
+
+from core.backends import JSONBackend, SQLiteBackend, STORAGE_ENV
+from core.dates import format_date, format_month, month_key_of_ordinal, year_bounds
+from core.edits import apply_edit_list
+from core.ledger import monthly_total, check_duplicates, month_summary, save_transactions, range_report, search_expenses, budget_forecast
+from core.store import TransactionStore
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+SEED = 2024
+# High enough (in rupees) that the budget check never rejects a benchmark save
+BUDGET = 10 ** 9
+CATEGORIES = [
+    'Groceries', 'Rent', 'Fuel', 'Tea', 'Lunch', 'Dinner', 'Cab', 'Bus', 'Metro', 'Movies',
+    'Books', 'Electricity', 'Water', 'Internet', 'Phone', 'Gym', 'Medicine', 'Doctor', 'Clothes', 'Shoes',
+    'Gifts', 'Snacks', 'Coffee', 'Parking', 'Repairs', 'Insurance', 'Travel', 'Hotel', 'Laundry', 'Stationery',
+]
+NAMES = [f"{category} {i}" for category in CATEGORIES for i in range(1, 11)]
+
+
+def generate_records(count, seed=SEED):
+    """
+    Returns count transaction dicts over enough years that no date needs
+    more names than there are (about 1-20 years), oldest first
+    """
+    rng = random.Random(seed)
+    years = max(1, min(20, count // 25000 + 1))
+    first = Date(2024 - years + 1, 1, 1).toordinal()
+    days = Date(2024, 12, 31).toordinal() - first + 1
+
+    # Spread the rows over the days, then pick distinct names for each day
+    per_day = [0] * days
+    for _ in range(count):
+        per_day[rng.randrange(days)] += 1
+    records = []
+    for offset, rows in enumerate(per_day):
+        ordinal = first + offset
+        date = format_date(ordinal)
+        for name in rng.sample(NAMES, min(rows, len(NAMES))):
+            records.append({
+                'date': date,
+                'expense': name,
+                'paise': rng.randint(500, 500000),
+                'ordinal': ordinal,
+                'month_key': month_key_of_ordinal(ordinal),
+            })
+    return records, first, first + days - 1
+
+
+def write_user(username, records, storage):
+    """
+    Save the records as a user's whole ledger, straight through the backend
+    """
+    if storage == 'sqlite':
+        backend = SQLiteBackend(username)
+        backend.insert_transactions(records)
+        backend.conn.close()
+    else:
+        JSONBackend(username).rewrite_transactions(list(enumerate(records, 1)))
+
+
+def measure(run, iterations):
+    """
+    Call run(i) for i in range(iterations). Returns a dict of throughput,
+    p50/p99 latency, and the peak memory of one more call under tracemalloc.
+    """
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(i)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    run(iterations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'ops_per_s': iterations / (sum(timings) / 1000) if sum(timings) else float('inf'),
+        'p50_ms': timings[len(timings) // 2],
+        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        'peak_kb': peak / 1024,
+    }
+
+
+def bench_size(label, count, storage, iterations):
+    """
+    Build a synthetic user of count transactions and time each operation.
+    Returns a dict of operation -> results.
+    """
+    username = f"bench_{label}"
+    records, first, last = generate_records(count)
+    write_user(username, records, storage)
+    rng = random.Random(SEED + 1)
+    months = sorted({record['month_key'] for record in records})
+    results = {}
+
+    # Opening the store: read the files and build every index
+    stores = []
+
+    def open_store(i):
+        stores.append(TransactionStore(username))
+    results['open_store'] = measure(open_store, 3 if count < 1000000 else 1)
+    store = stores[-1]
+    stores.clear()
+
+    def month_total(i):
+        monthly_total(store, format_month(rng.choice(months)))
+    results['get_monthly_total'] = measure(month_total, iterations * 10)
+
+    def duplicates(i):
+        date = format_date(rng.randint(first, last))
+        check_duplicates(store, date, rng.sample(NAMES, 5))
+    results['check_duplicates'] = measure(duplicates, iterations * 10)
+
+    def month_grouping(i):
+        # What the Monthly screen builds its rows from on a cache miss
+        month_summary(store, format_month(rng.choice(months)))
+    results['month_grouping'] = measure(month_grouping, max(10, iterations // 5))
+
+    def year_report(i):
+        # What the Reports screen builds its rows from for a year
+        range_report(store, *year_bounds(rng.randint(first, last)))
+    results['year_report'] = measure(year_report, max(10, iterations // 5))
+
+    def search_index(i):
+        # Built on the first search, then kept up to date by every write
+        store.search = None
+        store.search_index()
+    results['search_index'] = measure(search_index, 3 if count < 1000000 else 1)
+
+    def search(i):
+        # "How much on fuel this year": a name's first letters over a year
+        search_expenses(store, rng.choice(NAMES)[:3], *year_bounds(rng.randint(first, last)), rows=20)
+    results['search'] = measure(search, iterations * 2)
+
+    def forecast_build(i):
+        # A month not forecast before: its days and history are read once
+        budget_forecast(store, format_month(rng.choice(months)), BUDGET, today=last)
+    results['forecast_build'] = measure(forecast_build, iterations * 2)
+
+    def forecast(i):
+        # What Home shows after each save: the same month, kept up to date
+        date = format_date(rng.randint(last - 27, last))
+        save_transactions(store, date, [(f"Forecast {i}", "1")], BUDGET)
+        budget_forecast(store, format_month(months[-1]), BUDGET, today=last)
+    results['save_and_forecast'] = measure(forecast, iterations)
+
+    def save(i):
+        # Duplicate check, budget check against the month total, insert
+        date = format_date(rng.randint(first, last))
+        entries = [(f"New {i} {n}", str(rng.randint(1, 999))) for n in range(5)]
+        save_transactions(store, date, entries, BUDGET)
+    results['save_transactions'] = measure(save, iterations)
+
+    def update(i):
+        # What the Edit screen runs for a single-date edit
+        record = records[rng.randrange(len(records))]
+        apply_edit_list(store, [{
+            'date': record['date'], 'expense': record['expense'],
+            'new_expense': record['expense'], 'amount': str(rng.randint(1, 9999)),
+        }])
+    results['update_expense'] = measure(update, iterations)
+    return results
+
+
+def print_results(label, count, results):
+    print(f"\n{label}: {count} transactions")
+    print(f"  {'operation':<20}{'n':>7}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak KB':>11}")
+    for name, result in results.items():
+        print(
+            f"  {name:<20}{result['iterations']:>7}{result['ops_per_s']:>12.0f}"
+            f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}{result['peak_kb']:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the tracker's non-UI logic on synthetic ledgers")
+    parser.add_argument('--sizes', default='1k,100k,1m', help="comma-separated, from: " + ", ".join(SIZES))
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--iterations', type=int, default=200, help="base number of calls per operation")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    os.environ[STORAGE_ENV] = args.storage
+    workdir = tempfile.mkdtemp(prefix='tracker-bench-')
+    original_dir = os.getcwd()
+    os.chdir(workdir)
+    all_results = {}
+    try:
+        for label in args.sizes.split(','):
+            label = label.strip().lower()
+            if label not in SIZES:
+                parser.error(f"unknown size {label!r}")
+            results = bench_size(label, SIZES[label], args.storage, args.iterations)
+            print_results(label, SIZES[label], results)
+            all_results[label] = results
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'storage': args.storage, 'seed': SEED, 'results': all_results}, f, indent=2)
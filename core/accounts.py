@@ -0,0 +1,158 @@
+from core.filelock import file_lock
+import hashlib
+import hmac
+import os
+import threading
+
+# Passwords are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>".
+# Accounts saved before hashing was added hold the plain password; it is
+# replaced with a hash the first time that user logs in successfully.
+HASH_ALGORITHM = 'pbkdf2_sha256'
+ITERATIONS = 200000
+SALT_BYTES = 16
+
+USERS_PATH = 'database/users.json'
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_accounts():
+    """
+    Return the account service shared by the login and register screens
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AccountService(USERS_PATH)
+        return _service
+
+
+def hash_password(password, salt=None, iterations=ITERATIONS):
+    """
+    Returns a salted PBKDF2 hash of a password in the stored format.
+    Deliberately slow: call it off the UI thread.
+    """
+    salt = salt if salt is not None else os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored):
+    """
+    Returns True if a stored password is a hash rather than plain text
+    """
+    return stored.startswith(HASH_ALGORITHM + '$')
+
+
+def check_password(password, stored):
+    """
+    Returns True if the password matches a stored hash (or, for an old
+    account, the stored plain password)
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    try:
+        _, iterations, salt, _ = stored.split('$')
+        expected = hash_password(password, bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected, stored)
+
+
+class AccountService:
+    """
+    User accounts, read from users.json once and indexed by username.
+
+    All reads and writes of the file in this process go through this one
+    TinyDB handle, and writes hold a file lock on users.json, so
+    registrations can't overwrite each other, even from two processes.
+    Lookups use the in-memory index instead of scanning the table; the index
+    is reloaded when the version in the lock file shows that another
+    process has written. register() and authenticate() hash passwords and
+    are slow on purpose; screens run them on a worker thread.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.db = None
+        self.file_lock = file_lock(path + '.lock')
+        self.lock = threading.RLock()
+        self.version = None
+        # username -> (doc_id, stored password)
+        self.users = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-read the accounts if another process has written since they
+        were last read
+        """
+        if self.db is not None and self.file_lock.read_version() == self.version:
+            return
+        # Imported here, when the first account is looked up, to keep it
+        # off the startup path
+        from tinydb import TinyDB
+        with self.lock, self.file_lock:
+            if self.db is not None:
+                if self.file_lock.read_version() == self.version:
+                    return
+                self.db.close()
+            # A fresh handle, since TinyDB caches the next free doc id
+            self.db = TinyDB(self.path)
+            self.users = {
+                user['username']: (user.doc_id, user.get('password', ''))
+                for user in self.db.all()
+                if 'username' in user
+            }
+            self.version = self.file_lock.read_version()
+
+    def exists(self, username):
+        """
+        Returns True if an account with this username exists
+        """
+        self.refresh()
+        with self.lock:
+            return username in self.users
+
+    def register(self, username, password):
+        """
+        Create an account. Raises ValueError if the username is taken.
+        """
+        if self.exists(username):
+            raise ValueError("Username already exists!")
+        hashed = hash_password(password)
+        with self.lock, self.file_lock:
+            # Checked again in case the name was taken while hashing
+            self.refresh()
+            if username in self.users:
+                raise ValueError("Username already exists!")
+            doc_id = self.db.insert({'username': username, 'password': hashed})
+            self.users[username] = (doc_id, hashed)
+            self.version = self.file_lock.bump_version()
+
+    def authenticate(self, username, password):
+        """
+        Returns True if the username and password match an account.
+        A plain-text password is replaced with a hash on success.
+        """
+        self.refresh()
+        with self.lock:
+            doc_id, stored = self.users.get(username, (None, None))
+        if doc_id is None:
+            # Hash anyway, so unknown usernames take as long as wrong passwords
+            hash_password(password)
+            return False
+        if not check_password(password, stored):
+            return False
+
+        if not is_hashed(stored) or int(stored.split('$')[1]) < ITERATIONS:
+            hashed = hash_password(password)
+            with self.lock, self.file_lock:
+                self.refresh()
+                if self.users.get(username, (None,))[0] == doc_id:
+                    self.db.update({'password': hashed}, doc_ids=[doc_id])
+                    self.users[username] = (doc_id, hashed)
+                    self.version = self.file_lock.bump_version()
+        return True
@@ -0,0 +1,197 @@
+from collections import defaultdict
+from core.dates import format_date, format_month
+from core.money import format_amount
+from core.store import get_store
+import argparse
+import threading
+
+# NumPy is optional: with it the group-bys below are vectorized, without it
+# the same results are computed with plain dictionaries
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class LedgerArrays:
+    """
+    Column-wise copy of a set of transactions, for reports.
+
+    Each transaction becomes one position in parallel columns: its day
+    number, month key, amount in paise and an interned id for its expense
+    name. Totals are returned in paise; averages may be fractional paise.
+    The columns are NumPy arrays when NumPy is installed, lists otherwise.
+    """
+
+    def __init__(self, transactions):
+        self.names = []         # name id -> display name (first spelling seen)
+        name_ids = {}           # Transaction.key -> name id
+
+        ordinals, months, amounts, ids = [], [], [], []
+        for transaction in transactions:
+            if transaction.ordinal is None:
+                continue
+            if transaction.key not in name_ids:
+                name_ids[transaction.key] = len(self.names)
+                self.names.append(transaction.expense)
+            ordinals.append(transaction.ordinal)
+            months.append(transaction.month_key)
+            amounts.append(transaction.paise)
+            ids.append(name_ids[transaction.key])
+
+        if np is not None:
+            self.ordinals = np.array(ordinals, dtype=np.int32)
+            self.months = np.array(months, dtype=np.int32)
+            self.amounts = np.array(amounts, dtype=np.int64)
+            self.name_ids = np.array(ids, dtype=np.int32)
+        else:
+            self.ordinals, self.months, self.amounts, self.name_ids = ordinals, months, amounts, ids
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def _mask(self, start=None, end=None):
+        """
+        Returns a boolean mask of the rows with start <= ordinal <= end (NumPy only)
+        """
+        mask = np.ones(len(self.ordinals), dtype=bool)
+        if start is not None:
+            mask &= self.ordinals >= start
+        if end is not None:
+            mask &= self.ordinals <= end
+        return mask
+
+    def _rows(self, start=None, end=None):
+        """
+        Returns the row positions with start <= ordinal <= end (plain Python only)
+        """
+        return [
+            i for i, ordinal in enumerate(self.ordinals)
+            if (start is None or ordinal >= start) and (end is None or ordinal <= end)
+        ]
+
+    def _group_sum(self, keys, start=None, end=None):
+        """
+        Returns a dict of key -> summed paise for the rows within the range
+        """
+        if np is not None:
+            mask = self._mask(start, end)
+            unique_keys, inverse = np.unique(keys[mask], return_inverse=True)
+            sums = np.bincount(inverse, weights=self.amounts[mask], minlength=len(unique_keys))
+            # bincount adds in float64, which is exact for whole numbers of
+            # paise below 2**53, so rounding back gives the exact int total
+            return dict(zip(unique_keys.tolist(), sums.round().astype(np.int64).tolist()))
+
+        totals = defaultdict(int)
+        for i in self._rows(start, end):
+            totals[keys[i]] += self.amounts[i]
+        return dict(totals)
+
+    def daily_totals(self, start=None, end=None):
+        """
+        Returns a dict of day number -> total spent
+        """
+        return self._group_sum(self.ordinals, start, end)
+
+    def monthly_totals(self, start=None, end=None):
+        """
+        Returns a dict of YYYYMM month key -> total spent
+        """
+        return self._group_sum(self.months, start, end)
+
+    def yearly_totals(self, start=None, end=None):
+        """
+        Returns a dict of year -> total spent
+        """
+        if np is not None:
+            return self._group_sum(self.months // 100, start, end)
+        return self._group_sum([month // 100 for month in self.months], start, end)
+
+    def top_expenses(self, count=5, start=None, end=None):
+        """
+        Returns the count expense names with the highest totals, as a list
+        of (name, total) pairs, largest first
+        """
+        totals = self._group_sum(self.name_ids, start, end)
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [(self.names[name_id], total) for name_id, total in ranked]
+
+    def rolling_average(self, window=7, start=None, end=None):
+        """
+        Returns a list of (day number, average daily spend over the window
+        days ending on that day), for every day from the first to the last
+        transaction in range. Days without transactions count as zero.
+        """
+        daily = self.daily_totals(start, end)
+        if not daily:
+            return []
+        first, last = min(daily), max(daily)
+
+        if np is not None:
+            spend = np.zeros(last - first + 1, dtype=np.int64)
+            spend[np.array(list(daily)) - first] = list(daily.values())
+            sums = np.convolve(spend, np.ones(window))[:len(spend)]
+            counts = np.minimum(np.arange(1, len(spend) + 1), window)
+            return list(zip(range(first, last + 1), (sums / counts).tolist()))
+
+        averages = []
+        running = 0
+        for ordinal in range(first, last + 1):
+            running += daily.get(ordinal, 0)
+            if ordinal - window >= first:
+                running -= daily.get(ordinal - window, 0)
+            averages.append((ordinal, running / min(ordinal - first + 1, window)))
+        return averages
+
+
+# Whole-ledger arrays, rebuilt only when the store has changed since
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_ledger(username):
+    """
+    Returns LedgerArrays for all of a user's transactions
+    """
+    store = get_store(username)
+    with _ledgers_lock:
+        cached = _ledgers.get(username)
+        if cached is not None and cached[0] == store.version:
+            return cached[1]
+
+    with store.lock:
+        version = store.version
+        ledger = LedgerArrays(list(store.transactions.values()))
+
+    with _ledgers_lock:
+        _ledgers[username] = (version, ledger)
+    return ledger
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.analytics USERNAME [--top N] [--window DAYS]
+    parser = argparse.ArgumentParser(description="Print spending reports for a user")
+    parser.add_argument('username')
+    parser.add_argument('--top', type=int, default=5, help="number of top expenses to list")
+    parser.add_argument('--window', type=int, default=30, help="days in the rolling average")
+    args = parser.parse_args()
+
+    ledger = get_ledger(args.username)
+    print(f"{len(ledger)} transactions ({'NumPy' if np is not None else 'pure Python'})")
+
+    print("\nYearly totals")
+    for year, total in sorted(ledger.yearly_totals().items()):
+        print(f"  {year}: ₹{format_amount(total)}")
+
+    print("\nMonthly totals")
+    for month, total in sorted(ledger.monthly_totals().items()):
+        print(f"  {format_month(month)}: ₹{format_amount(total)}")
+
+    print(f"\nTop {args.top} expenses")
+    for name, total in ledger.top_expenses(args.top):
+        print(f"  {name}: ₹{format_amount(total)}")
+
+    averages = ledger.rolling_average(args.window)
+    if averages:
+        ordinal, average = averages[-1]
+        print(f"\n{args.window}-day average daily spend to {format_date(ordinal)}: ₹{format_amount(average)}")
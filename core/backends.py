@@ -0,0 +1,457 @@
+from core.dates import month_of, with_date_keys
+from core.filelock import file_lock
+from core.money import to_paise
+import sqlite3
+import threading
+import json
+import os
+
+# Which backend to use: 'json', 'sqlite', or unset to pick SQLite only for
+# users that already have a migrated database file
+STORAGE_ENV = 'TRACKER_STORAGE'
+
+
+def lock_path_for(username):
+    """
+    Returns the path of the lock file guarding a user's data. Both backends
+    use the same one, and every transaction write bumps the version number
+    in it (see core.filelock), so other processes know to reload.
+    """
+    return f'database/{username}_transactions.lock'
+
+
+def get_backend(username):
+    """
+    Returns the storage backend configured for a user
+    """
+    choice = os.environ.get(STORAGE_ENV, '').lower()
+    if choice == 'sqlite' or (not choice and os.path.exists(SQLiteBackend.path_for(username))):
+        return SQLiteBackend(username)
+    return JSONBackend(username)
+
+
+class JSONBackend:
+    """
+    The original storage: a TinyDB-format snapshot of transactions plus a
+    TinyDB file for settings.
+
+    New, updated and deleted transactions are appended to a JSON-lines
+    journal next to the snapshot instead of rewriting it, so a save only
+    costs the size of the batch. The journal is replayed on load and folded
+    back into the snapshot by a background thread once it grows past
+    COMPACT_EVERY entries.
+
+    Loads, writes and compactions hold the user's file lock, so another
+    process never reads a half-rotated journal or appends with stale ids.
+    """
+
+    COMPACT_EVERY = 1000
+
+    def __init__(self, username):
+        os.makedirs('database', exist_ok=True)
+        self.snapshot_path = f'database/{username}_transactions.json'
+        self.journal_path = f'database/{username}_transactions.journal'
+        self.compacting_path = self.journal_path + '.compacting'
+        # TinyDB is only imported by users that still have JSON storage
+        from tinydb import TinyDB
+        self.settings_db = TinyDB(f'database/{username}_settings.json')
+
+        self.file_lock = file_lock(lock_path_for(username))
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.journal_entries = 0
+        self.compaction = None
+
+    def load_transactions(self):
+        """
+        Returns a list of (id, transaction) pairs for every stored transaction
+        """
+        with self.file_lock:
+            records = self._read_snapshot()
+            # A journal left behind by an interrupted compaction is replayed
+            # before the live one; replaying an entry twice is harmless
+            self._replay(self.compacting_path, records)
+            self.journal_entries = self._replay(self.journal_path, records)
+            self.next_id = max(records, default=0) + 1
+
+            if self.journal_entries >= self.COMPACT_EVERY or os.path.exists(self.compacting_path):
+                self.compact()
+        return sorted(records.items())
+
+    def _read_snapshot(self):
+        """
+        Returns the snapshot as a dict of id -> transaction. A missing or
+        empty file is an empty ledger; one that doesn't parse raises
+        ValueError, so it is never loaded as empty and compacted over.
+        """
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return {}
+        if not text.strip():
+            return {}
+        try:
+            table = json.loads(text).get('_default', {})
+            return {int(doc_id): transaction for doc_id, transaction in table.items()}
+        except (ValueError, AttributeError):
+            raise ValueError(f"{self.snapshot_path} is damaged; restore it from a backup")
+
+    def _replay(self, path, records):
+        """
+        Apply every entry of a journal file to records.
+        Returns the number of entries applied.
+        """
+        count = 0
+        offset = 0
+        try:
+            with open(path, 'r+b') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn last line from a crash mid-append (even one
+                        # that parses): the write never finished, so cut it
+                        # off and later appends start on a clean line
+                        f.truncate(offset)
+                        break
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A damaged line with entries after it: skip just this one
+                        print(f"Skipping a damaged journal entry in {path}")
+                        continue
+                    if entry['op'] == 'insert':
+                        records[entry['id']] = entry['record']
+                    elif entry['op'] == 'update':
+                        for doc_id in entry['ids']:
+                            if doc_id in records:
+                                records[doc_id].update(entry['fields'])
+                    elif entry['op'] == 'batch':
+                        # A whole batch of edits is one line, so a crash
+                        # leaves either all of it or none
+                        for doc_id, fields in entry['updates']:
+                            if doc_id in records:
+                                records[doc_id].update(fields)
+                        for doc_id in entry['deletes']:
+                            records.pop(doc_id, None)
+                    count += 1
+        except FileNotFoundError:
+            pass
+        return count
+
+    def _append(self, entries):
+        """
+        Durably append entries to the journal
+        """
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode('utf-8')
+        with self.file_lock:
+            with self.lock:
+                with open(self.journal_path, 'a+b') as f:
+                    self._cut_torn_line(f)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.journal_entries += len(entries)
+                should_compact = self.journal_entries >= self.COMPACT_EVERY
+            self.file_lock.bump_version()
+
+        if should_compact:
+            self.compact()
+
+    @staticmethod
+    def _cut_torn_line(f):
+        """
+        Cut off the last line of an open journal if it has no newline, as
+        _replay does, so an append never runs on from a torn line
+        """
+        end = f.seek(0, os.SEEK_END)
+        if not end:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        # Search back for the end of the last whole line
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+    def insert_transactions(self, transactions):
+        """
+        Save new transactions and return their ids
+        """
+        # Held from picking the ids to writing them, so two processes
+        # can't pick the same ones
+        with self.file_lock:
+            with self.lock:
+                ids = list(range(self.next_id, self.next_id + len(transactions)))
+                self.next_id += len(transactions)
+            self._append([
+                {'op': 'insert', 'id': doc_id, 'record': dict(transaction)}
+                for doc_id, transaction in zip(ids, transactions)
+            ])
+        return ids
+
+    def apply_changes(self, updates=(), deletes=()):
+        """
+        Apply a list of (id, field changes) pairs and delete a list of ids,
+        all in one journal entry
+        """
+        self._append([{
+            'op': 'batch',
+            'updates': [[doc_id, fields] for doc_id, fields in updates],
+            'deletes': list(deletes),
+        }])
+
+    def compact(self):
+        """
+        Start folding the journal into the snapshot on a background thread
+        """
+        with self.file_lock, self.lock:
+            if self.compaction and self.compaction.is_alive():
+                return
+            # New writes go to a fresh journal while the old one is folded in
+            if not os.path.exists(self.compacting_path):
+                if not os.path.exists(self.journal_path):
+                    return
+                os.replace(self.journal_path, self.compacting_path)
+                self.journal_entries = 0
+            self.compaction = threading.Thread(target=self._compact, daemon=True)
+            self.compaction.start()
+
+    def _compact(self):
+        """
+        Write snapshot + rotated journal to a new snapshot, then drop the journal
+        """
+        try:
+            with self.file_lock:
+                records = self._read_snapshot()
+                self._replay(self.compacting_path, records)
+                self._write_snapshot(records)
+                os.remove(self.compacting_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error compacting transactions: {e}")
+
+    def _write_snapshot(self, records):
+        """
+        Atomically replace the snapshot with a dict of id -> transaction
+        """
+        table = {str(doc_id): records[doc_id] for doc_id in sorted(records)}
+
+        # Write to a temporary file first so the snapshot is replaced atomically
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'_default': table}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+    def rewrite_transactions(self, records):
+        """
+        Replace every stored transaction with a list of (id, transaction)
+        pairs and empty the journal. Used by migrations, which run while the
+        app is closed. Don't call it while holding the file lock: it waits
+        for any running compaction, which needs the lock.
+        """
+        if self.compaction:
+            self.compaction.join()
+        with self.file_lock, self.lock:
+            self._write_snapshot(dict(records))
+            for path in (self.journal_path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.journal_entries = 0
+            self.file_lock.bump_version()
+
+    def load_settings(self):
+        """
+        Returns the user's settings as a dict (empty for a new user)
+        """
+        # The TinyDB handle is shared by every thread using this backend
+        with self.file_lock, self.lock:
+            settings = self.settings_db.all()
+        return dict(settings[0]) if settings else {}
+
+    def save_settings(self, settings):
+        """
+        Replace the user's settings
+        """
+        with self.file_lock, self.lock:
+            self.settings_db.truncate()  # Clear previous settings
+            self.settings_db.insert(settings)
+
+
+class SQLiteBackend:
+    """
+    Transactions and settings in a single SQLite file per user.
+
+    Writes only touch the affected rows instead of rewriting the whole file,
+    and WAL journaling keeps the database intact if the app dies mid-write.
+    Schema changes after the first version are applied by _upgrade() and
+    tracked in PRAGMA user_version. SQLite serializes the writes itself;
+    the user's file lock is held as well, so that other processes' stores
+    can check and reload exactly as with the JSON backend.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            month TEXT NOT NULL,
+            expense TEXT NOT NULL,
+            amount REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_month ON transactions (month);
+        CREATE INDEX IF NOT EXISTS idx_transactions_date_expense
+            ON transactions (date, lower(expense));
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    @staticmethod
+    def path_for(username):
+        """
+        Returns the path of a user's SQLite database file
+        """
+        return f'database/{username}.sqlite3'
+
+    def __init__(self, username):
+        os.makedirs('database', exist_ok=True)
+        # The connection is shared between the UI and any worker threads,
+        # so access to it is serialized with a lock
+        self.lock = threading.Lock()
+        self.file_lock = file_lock(lock_path_for(username))
+        self.conn = sqlite3.connect(self.path_for(username), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        """
+        Bring an older database file up to the current schema
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Version 1: pre-parsed day number and YYYYMM month key columns
+            with self.conn:
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+                if 'ordinal' not in columns:
+                    self.conn.execute("ALTER TABLE transactions ADD COLUMN ordinal INTEGER")
+                    self.conn.execute("ALTER TABLE transactions ADD COLUMN month_key INTEGER")
+                rows = self.conn.execute("SELECT id, date FROM transactions").fetchall()
+                self.conn.executemany(
+                    "UPDATE transactions SET ordinal = ?, month_key = ? WHERE id = ?",
+                    [
+                        (keys['ordinal'], keys['month_key'], row_id)
+                        for row_id, keys in ((row[0], with_date_keys({'date': row[1]})) for row in rows)
+                    ]
+                )
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_ordinal ON transactions (ordinal)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_month_key ON transactions (month_key)")
+                self.conn.execute("PRAGMA user_version = 1")
+        if version < 2:
+            # Version 2: exact int paise column; 'amount' (rupees) is kept
+            # filled in for anything else reading the file
+            with self.conn:
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+                if 'paise' not in columns:
+                    self.conn.execute("ALTER TABLE transactions ADD COLUMN paise INTEGER")
+                rows = self.conn.execute("SELECT id, amount FROM transactions").fetchall()
+                self.conn.executemany(
+                    "UPDATE transactions SET paise = ? WHERE id = ?",
+                    [(to_paise(amount), row_id) for row_id, amount in rows]
+                )
+                self.conn.execute("PRAGMA user_version = 2")
+
+    def load_transactions(self):
+        """
+        Returns a list of (id, transaction) pairs for every stored transaction
+        """
+        with self.file_lock, self.lock:
+            rows = self.conn.execute(
+                "SELECT id, date, expense, paise, ordinal, month_key FROM transactions ORDER BY id"
+            ).fetchall()
+        return [
+            (row[0], {'date': row[1], 'expense': row[2], 'paise': row[3], 'ordinal': row[4], 'month_key': row[5]})
+            for row in rows
+        ]
+
+    def insert_transactions(self, transactions, ids=None):
+        """
+        Save new transactions and return their ids. Explicit ids can be given
+        to keep the ids of migrated records.
+        """
+        new_ids = []
+        with self.file_lock, self.lock, self.conn:
+            for index, transaction in enumerate(transactions):
+                date = transaction.get('date', '')
+                cursor = self.conn.execute(
+                    "INSERT INTO transactions (id, date, month, expense, amount, paise, ordinal, month_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        ids[index] if ids else None,
+                        date,
+                        month_of(date),
+                        transaction.get('expense', ''),
+                        transaction['paise'] / 100,
+                        transaction['paise'],
+                        transaction.get('ordinal'),
+                        transaction.get('month_key'),
+                    )
+                )
+                new_ids.append(cursor.lastrowid)
+            self.file_lock.bump_version()
+        return new_ids
+
+    def apply_changes(self, updates=(), deletes=()):
+        """
+        Apply a list of (id, field changes) pairs and delete a list of ids,
+        all in one database transaction
+        """
+        # Rows changing the same columns share one prepared statement
+        statements = {}
+        for doc_id, fields in updates:
+            values = {column: fields[column] for column in ('expense', 'paise') if column in fields}
+            if 'paise' in values:
+                values['amount'] = values['paise'] / 100
+            if values:
+                statements.setdefault(tuple(values), []).append(list(values.values()) + [doc_id])
+
+        with self.file_lock:
+            with self.lock, self.conn:
+                for columns, rows in statements.items():
+                    assignments = ", ".join(f"{column} = ?" for column in columns)
+                    self.conn.executemany(f"UPDATE transactions SET {assignments} WHERE id = ?", rows)
+                self.conn.executemany("DELETE FROM transactions WHERE id = ?", [(doc_id,) for doc_id in deletes])
+            self.file_lock.bump_version()
+
+    def load_settings(self):
+        """
+        Returns the user's settings as a dict (empty for a new user)
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM settings").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_settings(self, settings):
+        """
+        Replace the user's settings
+        """
+        with self.file_lock, self.lock, self.conn:
+            self.conn.execute("DELETE FROM settings")
+            self.conn.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in settings.items()]
+            )
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from core.dates import month_key_of_ordinal
+import threading
+
+# Scopes whose value is a (start, end) range of day numbers, None for
+# open-ended; a write to any date in the range drops the entry
+RANGE_SCOPES = {'range', 'search'}
+
+
+def covers(key, ordinal):
+    """
+    Returns True if a key has a range scope that includes a day number
+    """
+    if key[0] not in RANGE_SCOPES:
+        return False
+    start, end = key[1]
+    return (start is None or start <= ordinal) and (end is None or ordinal <= end)
+
+
+class QueryCache:
+    """
+    Least-recently-used cache of per-date and per-month query results.
+
+    Keys are tuples whose first two items are the scope and its value, e.g.
+    ('date', 738950, ...) for a day number, ('month', 202403, ...) for a
+    month key or ('range', (738950, 739000), ...) for a range of days (see
+    RANGE_SCOPES). A write to a date drops only the entries for that date,
+    its month and the ranges that include it.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped on every invalidation, so a result computed while a write
+        # happened is not stored
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result for key, calling compute() on a miss
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            version = self.version
+
+        result = compute()
+
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = result
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return result
+
+    def invalidate_date(self, ordinal):
+        """
+        Drop every cached result for a day number, its month and the ranges
+        that include it
+        """
+        scopes = {('date', ordinal), ('month', month_key_of_ordinal(ordinal))}
+        with self.lock:
+            self.version += 1
+            for key in [key for key in self.entries if key[:2] in scopes or covers(key, ordinal)]:
+                del self.entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop every cached result
+        """
+        with self.lock:
+            self.version += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache's hit, miss and invalidation counters
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self.entries),
+            }
@@ -0,0 +1,114 @@
+from datetime import date as Date
+
+# Transactions keep their DD/MM/YYYY text for display, plus two integers
+# worked out once when the record is loaded or saved:
+#   ordinal   - the proleptic Gregorian day number (date.toordinal())
+#   month_key - YYYYMM, e.g. 202403 for March 2024
+# Indexes, totals and sorting use the integers only.
+
+
+def month_of(date):
+    """
+    Returns the MM/YYYY part of a DD/MM/YYYY date
+    """
+    return "/".join(date.split("/")[1:])
+
+
+def parse_date(text):
+    """
+    Returns a datetime.date for a DD/MM/YYYY string. Raises ValueError if invalid.
+    """
+    day, month, year = (int(part) for part in text.strip().split("/"))
+    return Date(year, month, day)
+
+
+def date_ordinal(text):
+    """
+    Returns the day number of a DD/MM/YYYY string, or None if it isn't a valid date
+    """
+    try:
+        return parse_date(text).toordinal()
+    except (ValueError, AttributeError):
+        return None
+
+
+def month_key(text):
+    """
+    Returns the YYYYMM key of a MM/YYYY string, or None if it isn't a valid month
+    """
+    try:
+        month, year = (int(part) for part in text.strip().split("/"))
+    except (ValueError, AttributeError):
+        return None
+    if not 1 <= month <= 12 or year < 1:
+        return None
+    return year * 100 + month
+
+
+def month_key_of_ordinal(ordinal):
+    """
+    Returns the YYYYMM key of the month a day number falls in
+    """
+    day = Date.fromordinal(ordinal)
+    return day.year * 100 + day.month
+
+
+def format_date(ordinal):
+    """
+    Returns a day number as DD/MM/YYYY
+    """
+    return Date.fromordinal(ordinal).strftime("%d/%m/%Y")
+
+
+def format_month(key):
+    """
+    Returns a YYYYMM key as MM/YYYY
+    """
+    return f"{key % 100:02d}/{key // 100:04d}"
+
+
+def with_date_keys(transaction):
+    """
+    Returns the transaction with its 'ordinal' and 'month_key' fields filled in
+    from its date. Both are None if the date can't be parsed.
+    """
+    ordinal = date_ordinal(transaction.get('date', ''))
+    transaction['ordinal'] = ordinal
+    transaction['month_key'] = month_key_of_ordinal(ordinal) if ordinal is not None else None
+    return transaction
+
+
+def quarter_bounds(ordinal):
+    """
+    Returns the first and last day numbers of the calendar quarter a day
+    number falls in
+    """
+    day = Date.fromordinal(ordinal)
+    first_month = (day.month - 1) // 3 * 3 + 1
+    first = Date(day.year, first_month, 1)
+    if first_month == 10:
+        after = Date(day.year + 1, 1, 1)
+    else:
+        after = Date(day.year, first_month + 3, 1)
+    return first.toordinal(), after.toordinal() - 1
+
+
+def year_bounds(ordinal):
+    """
+    Returns the first and last day numbers of the year a day number falls in
+    """
+    year = Date.fromordinal(ordinal).year
+    return Date(year, 1, 1).toordinal(), Date(year, 12, 31).toordinal()
+
+
+def month_bounds(key):
+    """
+    Returns the first and last day numbers of a month, given its YYYYMM key
+    """
+    year, month = divmod(key, 100)
+    first = Date(year, month, 1)
+    if month == 12:
+        after = Date(year + 1, 1, 1)
+    else:
+        after = Date(year, month + 1, 1)
+    return first.toordinal(), after.toordinal() - 1
@@ -0,0 +1,104 @@
+from core.dates import date_ordinal
+from core.money import to_paise, scale_paise
+from core.store import get_store
+import argparse
+import json
+
+# Batch edits. Both functions find the matching transactions through the
+# store's date index, work out every change, and hand them to
+# TransactionStore.apply_changes, which checks them all and then saves them
+# with a single write. Either every change is made or none is. The finding
+# and the write share one store.writing() block, so changes worked out from
+# amounts another process has since edited are never saved.
+# Dates are DD/MM/YYYY strings or day numbers; end defaults to start, and a
+# start of None means from the first transaction.
+
+
+def _matches(store, expense, start, end):
+    """
+    Returns the transactions named expense (ignoring case) from start to end
+    """
+    return store.find(expense, start, end if end is not None else start)
+
+
+def delete_expense(store, expense=None, start=None, end=None):
+    """
+    Delete an expense (or every expense, if none is given) on every date in
+    range. Returns the number deleted.
+    """
+    with store.writing():
+        transactions = _matches(store, expense, start, end)
+        store.apply_changes(deletes=[transaction.id for transaction in transactions])
+    return len(transactions)
+
+
+def apply_edit_list(store, edits):
+    """
+    Apply a list of edits as one batch. Each edit is a dict with 'date' and
+    'expense' (the transaction to change), an optional 'end' date to cover a
+    range, and one of:
+      'new_expense' and/or 'amount' (rupees) - rename and/or set the amount
+      'scale'                              - multiply the amount
+      'delete': true                       - remove the transaction
+    Returns the number of transactions changed.
+    """
+    with store.writing():
+        return _apply_edits(store, edits)
+
+
+def _apply_edits(store, edits):
+    """
+    apply_edit_list, once the store is held for writing
+    """
+    updates = {}
+    deletes = []
+    for number, edit in enumerate(edits, 1):
+        if not isinstance(edit, dict):
+            raise ValueError(f"Edit {number}: each edit must be an object")
+        expense = edit.get('expense')
+        # Without a name, find() would match every transaction in range
+        if not isinstance(expense, str) or not expense.strip():
+            raise ValueError(f"Edit {number}: an 'expense' name is needed")
+        start, end = edit.get('date'), edit.get('end', edit.get('date'))
+        if start is None or date_ordinal(start) is None or date_ordinal(end) is None:
+            raise ValueError(f"Edit {number}: a valid 'date' (DD/MM/YYYY) is needed")
+        transactions = store.find(expense.strip(), start, end)
+        if not transactions:
+            raise ValueError(f"Edit {number}: no '{expense.strip()}' on {start}")
+
+        for transaction in transactions:
+            if edit.get('delete'):
+                deletes.append(transaction.id)
+                continue
+            fields = updates.setdefault(transaction.id, {})
+            if edit.get('new_expense') is not None:
+                new_expense = edit['new_expense']
+                if not isinstance(new_expense, str) or not new_expense.strip():
+                    raise ValueError(f"Edit {number}: 'new_expense' must be a non-empty name")
+                fields['expense'] = new_expense.strip()
+            if 'amount' in edit:
+                fields['paise'] = to_paise(edit['amount'])
+            if 'scale' in edit:
+                fields['paise'] = scale_paise(fields.get('paise', transaction.paise), edit['scale'])
+
+    store.apply_changes(list(updates.items()), deletes)
+    return len(updates) + len(set(deletes) - set(updates))
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.edits USERNAME EDITS.json
+    # EDITS.json holds a list of edits as described in apply_edit_list, e.g.
+    # [{"date": "01/03/2024", "end": "31/03/2024", "expense": "Cab", "new_expense": "Taxi"}]
+    parser = argparse.ArgumentParser(description="Apply a list of edits to a user's transactions in one batch")
+    parser.add_argument('username')
+    parser.add_argument('path', help="JSON file with a list of edits")
+    args = parser.parse_args()
+
+    try:
+        with open(args.path, encoding='utf-8') as f:
+            edits = json.load(f)
+        count = apply_edit_list(get_store(args.username), edits)
+    except (OSError, ValueError) as e:
+        print(f"Error applying edits: {e}")
+    else:
+        print(f"Changed {count} transactions")
@@ -0,0 +1,234 @@
+from datetime import date as Date
+from decimal import Decimal
+from core.dates import date_ordinal, month_key, month_key_of_ordinal, month_bounds, format_date, format_month
+from core.money import format_amount
+from core.store import get_store
+import argparse
+import csv
+import os
+
+# pyarrow is optional and only needed for Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Exports are written chunk by chunk: rows come from the store a chunk at a
+# time (see TransactionStore.iter_range) and each chunk is written out before
+# the next is read, so memory use doesn't grow with the size of the ledger.
+
+CHUNK_SIZE = 10000
+FORMATS = ('csv', 'parquet')
+REPORTS = ('transactions', 'daily', 'monthly')
+EXPORT_DIR = 'exports'
+
+
+def _columns(report):
+    """
+    Returns the (name, kind) of each column of a report; the kind decides
+    how values are written (see _csv_value and _arrow_column)
+    """
+    if report == 'transactions':
+        return [('date', 'date'), ('expense', 'string'), ('amount', 'paise')]
+    if report == 'daily':
+        return [('date', 'date'), ('transactions', 'count'), ('total', 'paise')]
+    return [('month', 'month'), ('transactions', 'count'), ('total', 'paise')]
+
+
+def transaction_chunks(store, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of (day number, expense, paise) rows in date order
+    """
+    for chunk in store.iter_range(start, end, chunk_size):
+        yield [(transaction.ordinal, transaction.expense, transaction.paise) for transaction in chunk]
+
+
+def daily_chunks(store, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of (day number, transaction count, total paise) rows, one
+    per day with transactions, from the store's running day totals
+    """
+    for chunk in store.iter_range(start, end, chunk_size):
+        # Chunks always hold whole days, so no day is split between two
+        counts = {}
+        for transaction in chunk:
+            counts[transaction.ordinal] = counts.get(transaction.ordinal, 0) + 1
+        yield [(ordinal, count, store.day_total(ordinal)) for ordinal, count in counts.items()]
+
+
+def monthly_chunks(store, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of (month key, transaction count, total paise) rows, one
+    per month with transactions. Totals are summed from the rows in range,
+    so a range that cuts a month in two only counts its part of the month.
+    """
+    rows = []
+    for chunk in daily_chunks(store, start, end, chunk_size):
+        for ordinal, count, total in chunk:
+            month = month_key_of_ordinal(ordinal)
+            if rows and rows[-1][0] == month:
+                rows[-1][1] += count
+                rows[-1][2] += total
+            else:
+                rows.append([month, count, total])
+        if len(rows) > 1:
+            yield [tuple(row) for row in rows[:-1]]
+            rows = rows[-1:]
+    if rows:
+        yield [tuple(row) for row in rows]
+
+
+def _csv_value(kind, value):
+    """
+    Returns a column value as it is written to CSV
+    """
+    if kind == 'date':
+        return format_date(value)
+    if kind == 'month':
+        return format_month(value)
+    if kind == 'paise':
+        return format_amount(value)
+    return value
+
+
+def _arrow_column(kind, values):
+    """
+    Returns a column of values as a pyarrow array. Amounts stay exact as
+    decimals with two places; dates become real date values.
+    """
+    if kind == 'date':
+        return pa.array([Date.fromordinal(value) for value in values], type=pa.date32())
+    if kind == 'month':
+        return pa.array([format_month(value) for value in values], type=pa.string())
+    if kind == 'paise':
+        return pa.array([Decimal(value).scaleb(-2) for value in values], type=pa.decimal128(18, 2))
+    if kind == 'count':
+        return pa.array(values, type=pa.int64())
+    return pa.array(values, type=pa.string())
+
+
+def write_csv(path, columns, chunks):
+    """
+    Write chunks of rows to a CSV file with a header row.
+    Returns the number of rows written.
+    """
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        for chunk in chunks:
+            writer.writerows(
+                [_csv_value(kind, value) for (_, kind), value in zip(columns, row)]
+                for row in chunk
+            )
+            count += len(chunk)
+    return count
+
+
+def write_parquet(path, columns, chunks):
+    """
+    Write chunks of rows to a Parquet file, one row group per chunk.
+    Returns the number of rows written.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    count = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.table({
+                name: _arrow_column(kind, [row[i] for row in chunk])
+                for i, (name, kind) in enumerate(columns)
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # No rows: still write a file with the right columns
+        pq.write_table(pa.table({name: _arrow_column(kind, []) for name, kind in columns}), path)
+    return count
+
+
+def export(username, path, report='transactions', file_format=None, start=None, end=None,
+           chunk_size=CHUNK_SIZE):
+    """
+    Write a user's transactions, or their daily or monthly totals, between
+    start and end (DD/MM/YYYY or day numbers; None for no limit) to a CSV or
+    Parquet file. The format defaults to the file's extension.
+    Returns the number of rows written.
+    """
+    if report not in REPORTS:
+        raise ValueError(f"Unknown report: {report!r}")
+    file_format = file_format or ('parquet' if path.lower().endswith('.parquet') else 'csv')
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown format: {file_format!r}")
+
+    store = get_store(username)
+    chunks = {
+        'transactions': transaction_chunks,
+        'daily': daily_chunks,
+        'monthly': monthly_chunks,
+    }[report](store, start, end, chunk_size)
+
+    # Write to a temporary file first so a failed export leaves no partial file
+    temp_path = path + '.tmp'
+    try:
+        write = write_parquet if file_format == 'parquet' else write_csv
+        count = write(temp_path, _columns(report), chunks)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return count
+
+
+def export_month(username, month_year, file_format='csv'):
+    """
+    Export a month's transactions to EXPORT_DIR. Returns (path, row count).
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    key = month_key(month_year)
+    if key is None:
+        raise ValueError(f"Invalid month: {month_year!r}")
+    extension = 'parquet' if file_format == 'parquet' else 'csv'
+    path = os.path.join(EXPORT_DIR, f"{username}_{key // 100:04d}-{key % 100:02d}.{extension}")
+    start, end = month_bounds(key)
+    return path, export(username, path, 'transactions', file_format, start, end)
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.export USERNAME FILE [--report transactions|daily|monthly]
+    #        [--from DD/MM/YYYY] [--to DD/MM/YYYY] [--month MM/YYYY]
+    parser = argparse.ArgumentParser(description="Export a user's transactions or totals to CSV or Parquet")
+    parser.add_argument('username')
+    parser.add_argument('path')
+    parser.add_argument('--report', choices=REPORTS, default='transactions')
+    parser.add_argument('--format', choices=FORMATS, help="file format (default: from the extension)")
+    parser.add_argument('--from', dest='start', help="first date to include (DD/MM/YYYY)")
+    parser.add_argument('--to', dest='end', help="last date to include (DD/MM/YYYY)")
+    parser.add_argument('--month', help="only this month (MM/YYYY)")
+    args = parser.parse_args()
+
+    try:
+        if args.month:
+            key = month_key(args.month)
+            if key is None:
+                raise ValueError(f"Invalid month: {args.month!r}")
+            start, end = month_bounds(key)
+        else:
+            start = date_ordinal(args.start) if args.start else None
+            end = date_ordinal(args.end) if args.end else None
+            for text, ordinal in ((args.start, start), (args.end, end)):
+                if text and ordinal is None:
+                    raise ValueError(f"Invalid date: {text!r}")
+        count = export(args.username, args.path, args.report, args.format, start, end)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error exporting: {e}")
+    else:
+        print(f"Wrote {count} rows to {args.path}")
@@ -0,0 +1,142 @@
+from core.metrics import record
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Exclusive locks on files, shared between processes, with a version number.
+#
+# Every data file that more than one process may write (a user's
+# transactions, users.json) has a lock file next to it. Writers hold the
+# lock for the whole of a check-then-write, e.g. the budget check and the
+# insert. The lock file also holds a version number that every write bumps,
+# so a process can tell, without taking the lock, whether anyone else has
+# written since it last read the data (see TransactionStore.refresh).
+#
+# The time spent waiting for each lock is recorded as 'lock.wait' (see
+# core.metrics), so contention shows up in the debug overlay and the
+# metrics file.
+
+# On Windows a single byte is locked, far past the version number at the
+# start of the file, so the number can still be read while locked
+WINDOWS_LOCK_OFFSET = 1 << 30
+
+# One FileLock per path in this process: flock() locks held through two
+# separate opens of the same file block each other, even in one process
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def file_lock(path):
+    """
+    Return this process's lock for a lock file path, creating it on first use
+    """
+    with _locks_lock:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = FileLock(path)
+            _locks[path] = lock
+        return lock
+
+
+class FileLock:
+    """
+    A reentrant exclusive lock held across threads and processes.
+
+    Threads of this process queue on an RLock; the thread that holds it
+    also holds an OS lock on the file (flock, or msvcrt.locking on
+    Windows), taken on the outermost acquire and dropped on the last
+    release. Use it as a context manager.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+
+    def acquire(self):
+        start = time.perf_counter()
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self._lock_file()
+            except BaseException:
+                self.thread_lock.release()
+                raise
+            record('lock.wait', (time.perf_counter() - start) * 1000, lock=self.name)
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self._unlock_file()
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            return
+        os.lseek(self.fd, WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ten seconds; keep waiting
+                continue
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+
+    def read_version(self):
+        """
+        Returns the version number in the lock file (0 before the first
+        write). Doesn't need the lock.
+        """
+        if hasattr(os, 'pread'):
+            data = os.pread(self.fd, 32, 0)
+        else:
+            with self.thread_lock:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                data = os.read(self.fd, 32)
+        try:
+            return int(data.split(b'\n')[0] or 0)
+        except ValueError:
+            # Caught mid-write; the caller takes the lock and reads again
+            return -1
+
+    def bump_version(self):
+        """
+        Record a write: add one to the version number and return it.
+        Call it inside the same hold of the lock as the write itself.
+        """
+        with self:
+            version = max(self.read_version(), 0) + 1
+            # The number never gets shorter, so it can be overwritten in place
+            data = f"{version}\n".encode('ascii')
+            if hasattr(os, 'pwrite'):
+                os.pwrite(self.fd, data, 0)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                os.write(self.fd, data)
+            return version
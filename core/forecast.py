@@ -0,0 +1,115 @@
+from itertools import accumulate
+from core.dates import month_bounds
+
+# Month-end spending forecasts.
+#
+# Two projections of what a month will come to:
+#   linear  - the spending so far, continued at the same rate per day
+#   weekday - the same, but with each remaining day weighted by how much
+#             is usually spent on that day of the week, learnt from the
+#             HISTORY_WEEKS weeks before the month. A month that has had
+#             its weekends so far is not projected as if every day were one.
+# Spending already entered for later days of the month counts as well.
+#
+# A TransactionStore keeps the MonthForecast of the month last asked about
+# (see TransactionStore.month_forecast) and passes every change in amount
+# to it, so after it is built once a save costs a few additions rather than
+# a re-read of the user's history.
+
+# Weeks before the month that weekday weights are learnt from
+HISTORY_WEEKS = 8
+
+
+def weekday(ordinal):
+    """
+    Returns the day of the week of a day number, Monday being 0 (as date.weekday())
+    """
+    return (ordinal + 6) % 7
+
+
+class MonthForecast:
+    """
+    One month's spending day by day, with the totals per weekday of the
+    weeks before it. Amounts are in paise.
+    """
+
+    def __init__(self, month_key, day_totals):
+        """
+        Build from a dict of day number -> total (the store's day totals)
+        """
+        self.month_key = month_key
+        self.first, self.last = month_bounds(month_key)
+        self.daily = [day_totals.get(ordinal, 0) for ordinal in range(self.first, self.last + 1)]
+        self.cumulative = list(accumulate(self.daily))  # spent from the 1st through each day
+        self.history_start = self.first - 7 * HISTORY_WEEKS
+        self.weekday_totals = [0] * 7
+        for ordinal in range(self.history_start, self.first):
+            self.weekday_totals[weekday(ordinal)] += day_totals.get(ordinal, 0)
+
+    def add(self, ordinal, paise):
+        """
+        Record a change in the total of a day (may be negative). Days
+        outside the month and its history are ignored.
+        """
+        if self.first <= ordinal <= self.last:
+            index = ordinal - self.first
+            self.daily[index] += paise
+            for later in range(index, len(self.cumulative)):
+                self.cumulative[later] += paise
+        elif self.history_start <= ordinal < self.first:
+            self.weekday_totals[weekday(ordinal)] += paise
+
+    @property
+    def total(self):
+        """
+        Everything entered for the month
+        """
+        return self.cumulative[-1]
+
+    def spent(self, today):
+        """
+        Returns the amount spent from the 1st through a day number
+        """
+        if today < self.first:
+            return 0
+        return self.cumulative[min(today, self.last) - self.first]
+
+    def weights(self):
+        """
+        Returns how much each weekday is spent compared with the average day
+        (1.0 each if there is no history)
+        """
+        mean = sum(self.weekday_totals) / 7
+        if mean <= 0:
+            return [1.0] * 7
+        return [total / mean for total in self.weekday_totals]
+
+    def project(self, today):
+        """
+        Returns the (linear, weekday) projections of the month's total, as
+        of a day number
+        """
+        if today >= self.last:
+            return self.total, self.total
+        remaining = range(max(today + 1, self.first), self.last + 1)
+
+        if today < self.first:
+            # The month hasn't started: all there is to go on is the history
+            linear = self.total + sum(self.weekday_totals) * len(remaining) / (7 * HISTORY_WEEKS)
+            by_weekday = self.total + sum(
+                self.weekday_totals[weekday(ordinal)] for ordinal in remaining
+            ) / HISTORY_WEEKS
+            return round(linear), round(by_weekday)
+
+        elapsed = range(self.first, today + 1)
+        to_date = self.spent(today)
+        linear = self.total + to_date * len(remaining) / len(elapsed)
+
+        weights = self.weights()
+        elapsed_weight = sum(weights[weekday(ordinal)] for ordinal in elapsed)
+        if elapsed_weight:
+            remaining_weight = sum(weights[weekday(ordinal)] for ordinal in remaining)
+            by_weekday = self.total + to_date * remaining_weight / elapsed_weight
+        else:
+            by_weekday = linear
+        return round(linear), round(by_weekday)
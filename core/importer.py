@@ -0,0 +1,357 @@
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+from core.dates import date_ordinal, month_key_of_ordinal, format_date, format_month
+from core.models import expense_key
+from core.money import to_paise, format_amount
+from core.store import get_store
+import argparse
+import html
+import csv
+import os
+
+# Bank statements are imported as a chain of generators, one row at a time:
+#   read_csv / read_ofx -> parse_rows -> drop_duplicates -> apply_budget -> PendingBatch
+# Only the batch waiting to be written is held in memory, so the size of the
+# file doesn't matter. Each batch goes to the store with one insert_multiple.
+
+BATCH_SIZE = 5000
+
+# Header names recognised in CSV exports, compared in lower case
+DATE_COLUMNS = ('date', 'transaction date', 'txn date', 'value date', 'posting date')
+EXPENSE_COLUMNS = ('expense', 'description', 'narration', 'particulars', 'details', 'name', 'payee', 'memo')
+AMOUNT_COLUMNS = ('amount', 'debit', 'withdrawal', 'withdrawal amt.', 'debit amount', 'withdrawal amount')
+
+# Date formats tried in order for CSV rows that aren't DD/MM/YYYY
+DATE_FORMATS = ('%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%y', '%d %b %Y', '%d-%b-%Y', '%d.%m.%Y')
+
+# What to do with rows that take a month past the user's budget:
+#   warn   - import them and list the months that went over
+#   skip   - leave those rows out
+#   ignore - import everything without checking
+BUDGET_RULES = ('warn', 'skip', 'ignore')
+
+
+class ImportStats:
+    """
+    Running counts for one import, passed to the progress callback
+    """
+
+    def __init__(self, total_bytes=0):
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.rows = 0           # rows read from the file
+        self.imported = 0       # rows saved to the store
+        self.duplicates = 0     # rows already in the store or repeated in the file
+        self.invalid = 0        # rows with an unreadable date or amount, or no name
+        self.credits = 0        # incoming money, which isn't an expense
+        self.over_budget = 0    # rows that took their month past the budget
+        self.months_over_budget = set()
+
+    @property
+    def percent(self):
+        return 100 * self.bytes_read / self.total_bytes if self.total_bytes else 100
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows read, {self.imported} imported, {self.duplicates} duplicates, "
+            f"{self.invalid} invalid, {self.credits} credits, {self.over_budget} over budget"
+        )
+
+
+def _lines(path, stats):
+    """
+    Yields the decoded lines of a file, counting bytes read into stats
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            stats.bytes_read += len(line)
+            yield line.decode('utf-8-sig', errors='replace')
+
+
+def _find_column(header, names, override=None):
+    """
+    Returns the position of the first header matching one of names, or of
+    the override column if given. Raises ValueError if there is none.
+    """
+    columns = [column.strip().lower() for column in header]
+    for name in ((override.lower(),) if override else names):
+        if name in columns:
+            return columns.index(name)
+    raise ValueError(f"No {(override or names[0])!r} column in {header}")
+
+
+def read_csv(path, stats, date_column=None, expense_column=None, amount_column=None):
+    """
+    Yields (line number, date text, expense, amount text) for each CSV row.
+    Columns are found from the header row, or named explicitly.
+    """
+    reader = csv.reader(_lines(path, stats))
+    header = next(reader, None)
+    if header is None:
+        return
+    date_index = _find_column(header, DATE_COLUMNS, date_column)
+    expense_index = _find_column(header, EXPENSE_COLUMNS, expense_column)
+    amount_index = _find_column(header, AMOUNT_COLUMNS, amount_column)
+    width = max(date_index, expense_index, amount_index)
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) <= width:
+            yield reader.line_num, '', '', ''
+            continue
+        yield reader.line_num, row[date_index], row[expense_index], row[amount_index]
+
+
+def _ofx_tags(path, stats):
+    """
+    Yields (TAG, value) for every tag in an OFX file, reading it in chunks.
+    Handles both SGML (OFX 1.x, closing tags optional) and XML (OFX 2.x).
+    """
+    remainder = ''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            stats.bytes_read += len(chunk)
+            pieces = (remainder + chunk.decode('utf-8', errors='replace')).split('<')
+            # The last piece may be cut off mid-tag; keep it for the next chunk
+            remainder = pieces.pop()
+            for piece in pieces:
+                tag, _, value = piece.partition('>')
+                if tag:
+                    yield tag.strip().upper(), value.strip()
+    tag, _, value = remainder.partition('>')
+    if tag:
+        yield tag.strip().upper(), value.strip()
+
+
+def read_ofx(path, stats):
+    """
+    Yields (transaction number, date text, expense, amount text) for each
+    STMTTRN record of an OFX file. OFX debits are negative amounts.
+    """
+    count = 0
+    transaction = None
+    for tag, value in _ofx_tags(path, stats):
+        if tag == 'STMTTRN':
+            transaction = {}
+        elif tag == '/STMTTRN' and transaction is not None:
+            count += 1
+            date = transaction.get('DTPOSTED', '')[:8]
+            yield (
+                count,
+                f"{date[6:8]}/{date[4:6]}/{date[:4]}" if len(date) == 8 else '',
+                html.unescape(transaction.get('NAME') or transaction.get('MEMO') or ''),
+                transaction.get('TRNAMT', ''),
+            )
+            transaction = None
+        elif transaction is not None and not tag.startswith('/'):
+            transaction[tag] = value
+
+
+@lru_cache(maxsize=4096)
+def statement_ordinal(text):
+    """
+    Returns the day number of a statement date, or None if no known format
+    matches. Statements repeat the same dates many times, hence the cache.
+    """
+    text = text.strip()
+    # DD/MM/YYYY directly; date_ordinal would also read DD/MM/YY as the
+    # year 24, so short years go to the formats below
+    if len(text.rpartition('/')[2]) == 4:
+        ordinal = date_ordinal(text)
+        if ordinal is not None:
+            return ordinal
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_rows(rows, stats, debits_negative=False):
+    """
+    Turns raw rows into transaction dicts, dropping unreadable rows and
+    credits. With debits_negative, spending is the negative amounts (as in
+    OFX and many signed CSV exports); otherwise it is the positive ones.
+    """
+    for _, date_text, expense, amount in rows:
+        stats.rows += 1
+        ordinal = statement_ordinal(date_text)
+        expense = " ".join(expense.split())
+        amount = amount.replace(',', '').strip()
+        try:
+            paise = to_paise(amount) if amount else 0
+        except ValueError:
+            paise = None
+        if ordinal is None or not expense or paise is None:
+            stats.invalid += 1
+            continue
+
+        if debits_negative:
+            paise = -paise
+        if paise <= 0:
+            # Refunds and deposits, or an empty debit cell next to a credit
+            stats.credits += 1
+            continue
+
+        yield {
+            'date': format_date(ordinal),
+            'expense': expense,
+            'paise': paise,
+            'ordinal': ordinal,
+            'month_key': month_key_of_ordinal(ordinal),
+        }
+
+
+class PendingBatch:
+    """
+    The rows waiting to be written, with their (date, name) keys and month
+    totals, so the checks below also see rows that aren't in the store yet
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.keys = set()
+        self.month_totals = defaultdict(int)    # month_key -> paise
+
+    def add(self, transaction):
+        self.rows.append(transaction)
+        self.keys.add((transaction['ordinal'], expense_key(transaction['expense'])))
+        self.month_totals[transaction['month_key']] += transaction['paise']
+
+    def clear(self):
+        self.rows = []
+        self.keys.clear()
+        self.month_totals.clear()
+
+
+def drop_duplicates(transactions, store, pending, stats):
+    """
+    Skips transactions whose (date, name) is already in the store, or in
+    the batch waiting to be written
+    """
+    for transaction in transactions:
+        key = (transaction['ordinal'], expense_key(transaction['expense']))
+        if key in pending.keys or store.has_expense(transaction['ordinal'], transaction['expense']):
+            stats.duplicates += 1
+            continue
+        yield transaction
+
+
+def apply_budget(transactions, store, pending, budget, rule, stats):
+    """
+    Checks each transaction against the monthly budget (in paise), counting
+    both saved and pending rows, and applies the budget rule
+    """
+    for transaction in transactions:
+        if rule == 'ignore' or budget is None:
+            yield transaction
+            continue
+
+        month = transaction['month_key']
+        if store.month_total(month) + pending.month_totals[month] + transaction['paise'] > budget:
+            stats.over_budget += 1
+            stats.months_over_budget.add(month)
+            if rule == 'skip':
+                continue
+        yield transaction
+
+
+def import_rows(username, rows, stats, budget_rule='warn', batch_size=BATCH_SIZE,
+                progress=None, debits_negative=False):
+    """
+    Run raw rows through the pipeline into the user's store, batch_size rows
+    per write. progress(stats) is called after every batch. Returns stats.
+    """
+    if budget_rule not in BUDGET_RULES:
+        raise ValueError(f"Unknown budget rule: {budget_rule!r}")
+    store = get_store(username)
+    budget = store.backend.load_settings().get('budget')
+    budget = to_paise(budget) if budget is not None else None
+
+    pending = PendingBatch()
+    transactions = parse_rows(rows, stats, debits_negative)
+    transactions = drop_duplicates(transactions, store, pending, stats)
+    transactions = apply_budget(transactions, store, pending, budget, budget_rule, stats)
+
+    for transaction in transactions:
+        pending.add(transaction)
+        if len(pending.rows) >= batch_size:
+            write_batch(store, pending, stats, progress)
+    write_batch(store, pending, stats, progress)
+    return stats
+
+
+def write_batch(store, pending, stats, progress=None):
+    """
+    Save the pending rows with a single store write and start a new batch
+    """
+    if pending.rows:
+        with store.writing():
+            # Another process may have saved some of these since they were
+            # checked; they are duplicates now
+            rows = [row for row in pending.rows if not store.has_expense(row['ordinal'], row['expense'])]
+            stats.duplicates += len(pending.rows) - len(rows)
+            if rows:
+                store.insert_multiple(rows)
+        stats.imported += len(rows)
+        pending.clear()
+    if progress:
+        progress(stats)
+
+
+def import_file(username, path, file_format=None, budget_rule='warn', batch_size=BATCH_SIZE,
+                progress=None, debits_negative=None, **columns):
+    """
+    Import a CSV or OFX bank statement into a user's transactions.
+    file_format is 'csv' or 'ofx' (by default, from the file extension);
+    columns may name the CSV date_column, expense_column and amount_column.
+    Returns the ImportStats.
+    """
+    file_format = file_format or ('ofx' if path.lower().endswith(('.ofx', '.qfx')) else 'csv')
+    stats = ImportStats(os.path.getsize(path))
+    if file_format == 'ofx':
+        rows = read_ofx(path, stats)
+        # OFX amounts are always signed from the account holder's side
+        debits_negative = True if debits_negative is None else debits_negative
+    else:
+        rows = read_csv(path, stats, **columns)
+    return import_rows(username, rows, stats, budget_rule, batch_size, progress, bool(debits_negative))
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.importer USERNAME FILE [--format csv|ofx] [--budget warn|skip|ignore]
+    parser = argparse.ArgumentParser(description="Import a bank statement (CSV or OFX) into a user's expenses")
+    parser.add_argument('username')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'ofx'], help="file format (default: from the extension)")
+    parser.add_argument('--budget', choices=BUDGET_RULES, default='warn',
+                        help="rows that exceed the monthly budget: warn, skip them, or ignore the budget")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="rows saved per write")
+    parser.add_argument('--debits-negative', action='store_true',
+                        help="spending is the negative amounts (CSV; always true for OFX)")
+    parser.add_argument('--date-column', help="CSV column holding the date")
+    parser.add_argument('--expense-column', help="CSV column holding the expense name")
+    parser.add_argument('--amount-column', help="CSV column holding the amount")
+    args = parser.parse_args()
+
+    def show_progress(stats):
+        print(f"\r{stats.percent:5.1f}%  {stats}", end="", flush=True)
+
+    try:
+        stats = import_file(
+            args.username, args.path, args.format, args.budget, args.batch_size, show_progress,
+            args.debits_negative or None, date_column=args.date_column,
+            expense_column=args.expense_column, amount_column=args.amount_column,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Error importing {args.path}: {e}")
+    else:
+        print()
+        for month in sorted(stats.months_over_budget):
+            print(f"Over budget in {format_month(month)}: ₹{format_amount(get_store(args.username).month_total(month))}")
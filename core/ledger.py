@@ -0,0 +1,382 @@
+from collections import defaultdict
+from datetime import date as Date
+from core.analytics import LedgerArrays
+from core.dates import date_ordinal, month_key, month_of, month_key_of_ordinal, quarter_bounds, year_bounds
+from core.edits import apply_edit_list, delete_expense as delete_matches
+from core.metrics import timer
+from core.money import to_paise, scale_paise, format_amount
+from core.search import MATCH_KINDS
+from core.store import expense_key
+import heapq
+
+# The expense logic behind the screens, with no Kivy in it. Every function
+# takes the user's TransactionStore (see core.store.get_store) and plain
+# values; problems the user can fix raise ValueError with the message the
+# screens show. The screens and the HTTP service (core.server) both call
+# these, so they always agree.
+
+# Budget given to a user who hasn't set one, in rupees
+DEFAULT_BUDGET = 10000
+
+# Share of the budget used at which forecasts warn, even if on course
+BUDGET_WARNING_SHARE = 0.9
+
+# Report periods: name -> function of today's day number giving (start, end)
+PERIODS = {
+    '30 days': lambda today: (today - 29, today),
+    '90 days': lambda today: (today - 89, today),
+    'quarter': quarter_bounds,
+    'year': year_bounds,
+}
+
+
+def monthly_total(store, month_year):
+    """
+    Returns the total spent in a month (MM/YYYY), in paise
+    """
+    return store.month_total(month_year)
+
+
+def check_duplicates(store, date, expenses):
+    """
+    Check if any of the expenses already exist for the given date,
+    or appear more than once among the expenses themselves
+    Returns tuple (bool, str) - (is_duplicate, duplicate_expense_name)
+    """
+    seen = set()
+    with timer('ledger.check_duplicates'):
+        for expense in expenses:
+            key = expense_key(expense)
+            if key in seen or store.has_expense(date, expense):
+                return True, expense
+            seen.add(key)
+    return False, None
+
+
+def save_transactions(store, date, entries, budget):
+    """
+    Save a batch of (expense, amount) pairs entered for a date, if none of
+    them is a duplicate and the month stays within budget (in rupees).
+    Entries with an empty name or amount are left out, as are amounts that
+    aren't numbers. Returns the new doc ids.
+    """
+    if date_ordinal(date) is None:
+        raise ValueError("Please enter a valid date (DD/MM/YYYY)")
+
+    expense_dict = {}
+    new_expenses = []
+    batch_total = 0
+    for number, (expense, amount) in enumerate(entries, 1):
+        if not isinstance(expense, str):
+            raise ValueError(f"Expense {number} must be a name")
+        expense, amount = expense.strip(), str(amount).strip()
+        if not expense or not amount:
+            continue
+        new_expenses.append(expense)
+        try:
+            # Amounts are kept in whole paise so totals stay exact
+            paise = to_paise(amount)
+        except ValueError:
+            print(f"Invalid amount for expense {number}")
+            continue
+        batch_total += paise
+        expense_dict[expense.lower()] = {'date': date, 'expense': expense, 'paise': paise}
+
+    transactions = list(expense_dict.values())
+    if not transactions:
+        raise ValueError("Please enter at least one expense and amount")
+
+    # The checks and the insert run under the store's and the user's file
+    # lock, so two saves for the same user, even from two processes, can't
+    # both pass the budget check
+    with store.writing():
+        has_duplicate, duplicate_name = check_duplicates(store, date, new_expenses)
+        if has_duplicate:
+            raise ValueError(
+                f"Transaction '{duplicate_name}' already exists for today, please use a different name"
+            )
+
+        if monthly_total(store, month_of(date)) + batch_total > to_paise(budget):
+            raise ValueError("Transaction failed: Monthly Budget Exceeded")
+
+        with timer('ledger.insert', rows=len(transactions)):
+            return store.insert_multiple(transactions)
+
+
+def day_transactions(store, date):
+    """
+    Returns (transactions, total paise) for a date (DD/MM/YYYY)
+    """
+    with timer('ledger.day'):
+        with store.lock:
+            return store.for_date(date), store.day_total(date)
+
+
+def month_summary(store, month_year, top=3):
+    """
+    Returns a month's transactions grouped by date, as a dict:
+      'days'         - [(day number, [transactions], day total)] in date order
+      'top_expenses' - the top biggest (name, total) pairs
+      'total'        - the month's total
+    All amounts are in paise. 'days' is empty if nothing was spent.
+    """
+    transactions_by_date = defaultdict(list)
+    with store.lock:
+        with timer('ledger.month_query'):
+            month_transactions = store.for_month(month_year)
+            for transaction in month_transactions:
+                transactions_by_date[transaction.ordinal].append(transaction)
+        # Totals are kept up to date by the store
+        days = [
+            (ordinal, transactions_by_date[ordinal], store.day_total(ordinal))
+            for ordinal in sorted(transactions_by_date)
+        ]
+        total = monthly_total(store, month_year)
+
+    with timer('ledger.month_aggregate'):
+        top_expenses = LedgerArrays(month_transactions).top_expenses(top) if month_transactions else []
+    return {'days': days, 'top_expenses': top_expenses, 'total': total}
+
+
+def find_matches(store, expense, start, end=None):
+    """
+    Returns the transactions named expense (ignoring case) from start to
+    end (DD/MM/YYYY; end defaults to start). Raises ValueError if the
+    inputs aren't usable or nothing matches.
+    """
+    end = end or start
+    if not isinstance(expense, str) or not expense.strip() or not start:
+        raise ValueError("Please enter existing expense and date")
+    if date_ordinal(start) is None or date_ordinal(end) is None:
+        raise ValueError("Please enter a valid date (DD/MM/YYYY)")
+    if date_ordinal(end) < date_ordinal(start):
+        raise ValueError("The end date is before the start date")
+    if store.is_empty():
+        raise ValueError("No transactions found")
+
+    matches = store.find(expense, start, end)
+    if not matches:
+        raise ValueError("No matching expense found for the given date")
+    return matches
+
+
+def update_expense(store, expense, start, end=None, new_expense='', amount='', scale=''):
+    """
+    Rename an expense on a date, or on every date of a range, and/or set or
+    scale its amount, as a single write. Returns the number changed.
+    """
+    if amount and scale:
+        raise ValueError("Enter a new amount or a scale, not both")
+    try:
+        if amount:
+            to_paise(amount)
+        if scale:
+            scale_paise(0, scale)
+    except ValueError:
+        raise ValueError("Invalid amount. Please enter a number.")
+
+    find_matches(store, expense, start, end)
+
+    # If new expense is not provided, use the old expense
+    edit = {'date': start, 'end': end or start, 'expense': expense, 'new_expense': new_expense or expense}
+    if amount:
+        edit['amount'] = amount
+    if scale:
+        edit['scale'] = scale
+    # Raises ValueError for a rename that collides with another expense
+    with timer('ledger.update'):
+        return apply_edit_list(store, [edit])
+
+
+def delete_expense(store, expense, start, end=None):
+    """
+    Delete an expense on a date, or on every date of a range, as a single
+    write. Returns the number deleted.
+    """
+    find_matches(store, expense, start, end)
+    with timer('ledger.delete'):
+        return delete_matches(store, expense, start, end or start)
+
+
+def check_month(month_year):
+    """
+    Raises ValueError unless month_year is a valid MM/YYYY month
+    """
+    if month_key(month_year) is None:
+        raise ValueError("Please enter a month in MM/YYYY format")
+
+
+def period_range(period, today=None):
+    """
+    Returns the (start, end) day numbers of a named report period (see
+    PERIODS) that includes today
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    today = today if today is not None else Date.today().toordinal()
+    return PERIODS[period](today)
+
+
+def range_report(store, start, end, top=5):
+    """
+    Returns a report of the spending from start to end (DD/MM/YYYY or day
+    numbers, inclusive), as a dict:
+      'start', 'end'  - the range as day numbers
+      'months'        - [(month key, total)] in order, for months with spending
+      'top_expenses'  - the top biggest (name, total) pairs
+      'total', 'count', 'days' - the total, and how many transactions and days
+    All amounts are in paise. The days in range come from two binary searches
+    of the store's sorted day list, and month totals from its day totals, so
+    only the range is ever read.
+    """
+    start = start if isinstance(start, int) else date_ordinal(start)
+    end = end if isinstance(end, int) else date_ordinal(end)
+    if start is None or end is None:
+        raise ValueError("Please enter dates in DD/MM/YYYY format")
+    if end < start:
+        raise ValueError("The end date is before the start date")
+
+    months = defaultdict(int)
+    with timer('ledger.range_query'):
+        with store.lock:
+            days = store.days_in_range(start, end)
+            for ordinal in days:
+                months[month_key_of_ordinal(ordinal)] += store.day_total(ordinal)
+
+    # Expense totals by name, over the transactions in range only
+    with timer('ledger.range_aggregate'):
+        totals = defaultdict(int)
+        names = {}
+        count = 0
+        for chunk in store.iter_range(start, end):
+            count += len(chunk)
+            for transaction in chunk:
+                totals[transaction.key] += transaction.paise
+                names.setdefault(transaction.key, transaction.expense)
+        top_expenses = [
+            (names[key], total) for key, total in heapq.nlargest(top, totals.items(), key=lambda item: item[1])
+        ]
+
+    return {
+        'start': start,
+        'end': end,
+        'months': sorted(months.items()),
+        'top_expenses': top_expenses,
+        'total': sum(months.values()),
+        'count': count,
+        'days': len(days),
+    }
+
+
+def search_expenses(store, query, start=None, end=None, limit=20, rows=0):
+    """
+    Returns the expense names matching a query (ignoring case; see
+    core.search) that were spent on from start to end (DD/MM/YYYY or day
+    numbers, inclusive; empty for open-ended), as a dict:
+      'matches' - up to limit dicts of 'name', 'match' (exact, prefix,
+                  substring or fuzzy), 'count' and 'total', best kind of
+                  match first, then biggest total. If rows is set, each
+                  also has 'transactions': up to rows of them, newest first.
+      'count', 'total' - over every match, not just the first limit
+    All amounts are in paise. Only the matching names' days are read.
+    """
+    if not query or not query.strip():
+        raise ValueError("Please enter an expense to search for")
+    bounds = []
+    for date in (start, end):
+        if date is None or date == '':
+            bounds.append(None)
+            continue
+        ordinal = date if isinstance(date, int) else date_ordinal(date)
+        if ordinal is None:
+            raise ValueError("Please enter dates in DD/MM/YYYY format")
+        bounds.append(ordinal)
+    start, end = bounds
+    if start is not None and end is not None and end < start:
+        raise ValueError("The end date is before the start date")
+
+    with timer('ledger.search'):
+        with store.lock:
+            index = store.search_index()
+            matches = []
+            for kind, key in index.search(query):
+                entry = index.names[key]
+                count, total = entry.range_total(start, end)
+                if count:
+                    matches.append({'name': entry.name, 'match': kind, 'count': count, 'total': total})
+            matches.sort(key=lambda match: (MATCH_KINDS.index(match['match']), -match['total']))
+
+            if rows:
+                # Walk each name's days back from the latest, stopping at rows
+                for match in matches[:limit]:
+                    key = expense_key(match['name'])
+                    latest = []
+                    for ordinal in reversed(index.names[key].days_in_range(start, end)):
+                        same_day = [transaction for transaction in store.for_date(ordinal) if transaction.key == key]
+                        latest.extend(reversed(same_day))
+                        if len(latest) >= rows:
+                            break
+                    match['transactions'] = latest[:rows]
+
+    return {
+        'matches': matches[:limit],
+        'count': sum(match['count'] for match in matches),
+        'total': sum(match['total'] for match in matches),
+    }
+
+
+def budget_forecast(store, month_year, budget, today=None):
+    """
+    Returns where a month's spending is heading against a budget (in
+    rupees), as of today (a day number; defaults to the real today), as a
+    dict:
+      'spent'      - spent from the 1st through today
+      'total'      - everything entered for the month, later days included
+      'linear', 'weekday' - projections of the month's total (see core.forecast)
+      'projected'  - the higher of the two
+      'budget'     - the budget
+      'daily'      - what can still be spent per remaining day within budget
+                     (None once the month is over)
+      'cumulative' - [(day number, spent through that day)] up to today
+      'warning'    - a message if the budget is, or is heading to be,
+                     crossed, else None
+    All amounts are in paise.
+    """
+    if not isinstance(month_year, int):
+        check_month(month_year)
+    today = today if today is not None else Date.today().toordinal()
+    budget = to_paise(budget)
+
+    with timer('ledger.forecast'):
+        with store.lock:
+            forecast = store.month_forecast(month_year)
+            linear, by_weekday = forecast.project(today)
+            total = forecast.total
+            spent = forecast.spent(today)
+            cumulative = [
+                (ordinal, forecast.cumulative[ordinal - forecast.first])
+                for ordinal in range(forecast.first, min(today, forecast.last) + 1)
+            ]
+            remaining_days = forecast.last - max(today, forecast.first - 1)
+
+    projected = max(linear, by_weekday)
+    if total > budget:
+        warning = f"Over budget by ₹{format_amount(total - budget)} this month"
+    elif budget > 0 and total >= budget * BUDGET_WARNING_SHARE:
+        warning = f"{total * 100 // budget}% of this month's budget used"
+    elif projected > budget and remaining_days > 0:
+        warning = f"On course to spend ₹{format_amount(projected)} this month, over the ₹{format_amount(budget)} budget"
+    else:
+        warning = None
+
+    return {
+        'spent': spent,
+        'total': total,
+        'linear': linear,
+        'weekday': by_weekday,
+        'projected': projected,
+        'budget': budget,
+        'daily': (budget - total) // remaining_days if remaining_days > 0 else None,
+        'cumulative': cumulative,
+        'warning': warning,
+    }
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from kivy.clock import Clock
+
+# Worker threads shared by every screen for reads and aggregation
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='loader')
+
+
+class BackgroundLoader:
+    """
+    Runs work on a worker thread and hands the result back on the Kivy
+    main thread.
+
+    Each screen owns one loader. Starting a new load makes any earlier one
+    stale: it is cancelled if it hasn't started yet, and its result is
+    dropped if it has, so only the latest request ever reaches the screen.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.future = None
+
+    def load(self, work, on_done, on_error=None):
+        """
+        Call work() in the background, then on_done(result) or
+        on_error(exception) on the main thread
+        """
+        self.cancel()
+        generation = self.generation
+
+        def run():
+            try:
+                result = work()
+            except Exception as e:
+                if on_error is not None:
+                    # Bound now: Python deletes e when the except block ends
+                    Clock.schedule_once(lambda dt, error=e: self._deliver(generation, on_error, error))
+                else:
+                    print(f"Error in background load: {e}")
+                return
+            Clock.schedule_once(lambda dt: self._deliver(generation, on_done, result))
+
+        self.future = _executor.submit(run)
+
+    def cancel(self):
+        """
+        Make the current load stale so its result is never delivered
+        """
+        self.generation += 1
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def _deliver(self, generation, callback, value):
+        """
+        Pass a finished load's value on, unless a newer load has started
+        """
+        if generation == self.generation:
+            self.future = None
+            callback(value)
@@ -0,0 +1,162 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+import atexit
+import json
+import os
+import threading
+import time
+
+# Lightweight timings. Code wraps the steps worth watching in timer(name),
+# e.g. 'view.query' or 'store.read'; each timing is kept in memory for the
+# debug overlay (see core.overlay) and, if TRACKER_METRICS names a file,
+# appended to it as one JSON object per line:
+#   {"ts": 1700000000.0, "name": "view.query", "ms": 1.8, "user": "alice"}
+METRICS_ENV = 'TRACKER_METRICS'
+
+# Timings kept per name for percentiles
+SAMPLES = 200
+
+# Buffered lines are written once this many are waiting, or on flush()
+FLUSH_EVERY = 50
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES))     # name -> recent ms
+_counts = defaultdict(int)                                  # name -> all-time count
+_pending = []                                               # JSON lines to write
+
+
+def record(name, ms, **fields):
+    """
+    Record one timing, in milliseconds, with optional extra fields
+    """
+    with _lock:
+        _samples[name].append(ms)
+        _counts[name] += 1
+        if os.environ.get(METRICS_ENV):
+            _pending.append(json.dumps({'ts': round(time.time(), 3), 'name': name, 'ms': round(ms, 3), **fields}))
+            should_flush = len(_pending) >= FLUSH_EVERY
+        else:
+            should_flush = False
+    if should_flush:
+        flush()
+
+
+@contextmanager
+def timer(name, **fields):
+    """
+    Time the body of a with block and record it under name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, **fields)
+
+
+def timed(name):
+    """
+    Decorator that records every call of a function under name
+    """
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def flush():
+    """
+    Append any buffered timings to the metrics file
+    """
+    path = os.environ.get(METRICS_ENV)
+    with _lock:
+        lines = _pending[:]
+        _pending.clear()
+    if not path or not lines:
+        return
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+
+atexit.register(flush)
+
+
+def _percentile(ordered, fraction):
+    """
+    Returns the value at a fraction (0-1) of the way through a sorted list
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary():
+    """
+    Returns a dict of name -> {count, last_ms, p50_ms, p95_ms, max_ms} over
+    the recent timings of each name
+    """
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items() if values}
+        counts = dict(_counts)
+    result = {}
+    for name, values in samples.items():
+        ordered = sorted(values)
+        result[name] = {
+            'count': counts[name],
+            'last_ms': values[-1],
+            'p50_ms': _percentile(ordered, 0.5),
+            'p95_ms': _percentile(ordered, 0.95),
+            'max_ms': ordered[-1],
+        }
+    return result
+
+
+def reset():
+    """
+    Forget every recorded timing
+    """
+    with _lock:
+        _samples.clear()
+        _counts.clear()
+        _pending.clear()
+
+
+class FrameMonitor:
+    """
+    Watches the time between Kivy clock frames and records every frame that
+    takes longer than STALL_MS as a 'frame.stall', so work that blocks the
+    UI thread shows up next to the timings that caused it
+    """
+
+    STALL_MS = 50
+
+    def __init__(self):
+        self.event = None
+        self.frames = 0
+        self.stalls = 0
+        self.worst_ms = 0
+
+    def start(self):
+        from kivy.clock import Clock
+        if self.event is None:
+            self.event = Clock.schedule_interval(self.on_frame, 0)
+
+    def stop(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+    def on_frame(self, dt):
+        ms = dt * 1000
+        self.frames += 1
+        self.worst_ms = max(self.worst_ms, ms)
+        if ms > self.STALL_MS:
+            self.stalls += 1
+            record('frame.stall', ms)
+
+
+frame_monitor = FrameMonitor()
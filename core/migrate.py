@@ -0,0 +1,90 @@
+from core.backends import JSONBackend, SQLiteBackend
+from core.dates import with_date_keys
+from core.money import with_paise
+import argparse
+import glob
+import os
+
+
+def find_json_users():
+    """
+    Returns the usernames that have JSON transaction or settings files
+    """
+    usernames = set()
+    for suffix in ('_transactions.json', '_transactions.journal', '_settings.json'):
+        for path in glob.glob(f'database/*{suffix}'):
+            usernames.add(os.path.basename(path)[:-len(suffix)])
+    return sorted(usernames)
+
+
+def migrate_user(username):
+    """
+    Copy a user's JSON transactions and settings into a new SQLite database.
+    Returns the number of transactions copied, or None if the user was
+    already migrated. The JSON files are left in place as a backup.
+    """
+    if os.path.exists(SQLiteBackend.path_for(username)):
+        return None
+
+    source = JSONBackend(username)
+    records = source.load_transactions()
+    target = SQLiteBackend(username)
+    try:
+        # Keep the original ids so nothing that refers to them changes
+        target.insert_transactions(
+            [with_paise(with_date_keys(transaction)) for _, transaction in records],
+            ids=[doc_id for doc_id, _ in records]
+        )
+        settings = source.load_settings()
+        if settings:
+            target.save_settings(settings)
+    except Exception:
+        # Don't leave a half-filled database behind: it would be picked up
+        # as the user's storage on the next start
+        target.conn.close()
+        for path in glob.glob(SQLiteBackend.path_for(username) + '*'):
+            os.remove(path)
+        raise
+    target.conn.close()
+    return len(records)
+
+
+def upgrade_json_records(username):
+    """
+    Bring every JSON transaction of a user up to the current record format:
+    pre-parsed date keys, and amounts as int paise instead of float rupees.
+    Returns the number of records updated.
+    """
+    backend = JSONBackend(username)
+    records = backend.load_transactions()
+    outdated = [
+        transaction for _, transaction in records
+        if 'ordinal' not in transaction or 'paise' not in transaction
+    ]
+    if not outdated:
+        return 0
+    for transaction in outdated:
+        if 'ordinal' not in transaction:
+            with_date_keys(transaction)
+        with_paise(transaction)
+    backend.rewrite_transactions(records)
+    return len(outdated)
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.migrate [--in-place] [USERNAME ...]
+    parser = argparse.ArgumentParser(description="Move users from the JSON files to SQLite")
+    parser.add_argument('usernames', nargs='*', help="defaults to every user found in database/")
+    parser.add_argument('--in-place', '--dates', dest='in_place', action='store_true',
+                        help="instead, upgrade the records in the JSON files to the current format")
+    args = parser.parse_args()
+
+    for username in args.usernames or find_json_users():
+        if args.in_place:
+            print(f"{username}: upgraded {upgrade_json_records(username)} transactions")
+            continue
+        count = migrate_user(username)
+        if count is None:
+            print(f"{username}: already migrated, skipped")
+        else:
+            print(f"{username}: migrated {count} transactions")
@@ -0,0 +1,71 @@
+from core.dates import with_date_keys
+from core.money import with_paise
+import sys
+
+
+def expense_key(expense):
+    """
+    Returns the form of an expense name used to compare names for duplicates
+    """
+    return expense.casefold()
+
+
+class Transaction:
+    """
+    One stored expense.
+
+    Uses __slots__ instead of a per-record dict, and interns the date text,
+    expense name and its casefolded key, so the many records that share a
+    date or a name share one string. The key is worked out once here, so
+    name comparisons never re-casefold.
+    """
+
+    __slots__ = ('id', 'date', 'expense', 'key', 'paise', 'ordinal', 'month_key')
+
+    def __init__(self, id, date, expense, paise, ordinal, month_key):
+        self.id = id
+        self.date = sys.intern(date)
+        self.expense = sys.intern(expense)
+        self.key = sys.intern(expense_key(expense))
+        self.paise = paise
+        self.ordinal = ordinal
+        self.month_key = month_key
+
+    @classmethod
+    def from_record(cls, id, record):
+        """
+        Build a Transaction from a stored dict, upgrading older formats
+        """
+        if 'ordinal' not in record:
+            with_date_keys(record)
+        with_paise(record)
+        return cls(
+            id,
+            record.get('date', ''),
+            record.get('expense', ''),
+            record['paise'],
+            record['ordinal'],
+            record['month_key'],
+        )
+
+    def to_record(self):
+        """
+        Returns the dict form that the storage backends save
+        """
+        return {
+            'date': self.date,
+            'expense': self.expense,
+            'paise': self.paise,
+            'ordinal': self.ordinal,
+            'month_key': self.month_key,
+        }
+
+    def rename(self, expense):
+        """
+        Change the expense name, keeping the comparison key in step
+        """
+        self.expense = sys.intern(expense)
+        self.key = sys.intern(expense_key(expense))
+
+    def __repr__(self):
+        return f"Transaction({self.id}, {self.date!r}, {self.expense!r}, paise={self.paise})"
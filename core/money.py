@@ -0,0 +1,65 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Amounts are stored and added up as whole paise (1 rupee = 100 paise), so
+# totals are exact. Rupee values only appear at the edges: parsing what the
+# user typed, and formatting for display.
+
+# Largest amount accepted, in rupees; anything bigger is a typo or junk data
+MAX_RUPEES = 10 ** 12
+MAX_PAISE = MAX_RUPEES * 100
+
+
+def to_paise(value):
+    """
+    Returns an amount in rupees (text, int or float) as an int number of paise.
+    Raises ValueError if the value isn't a number or is bigger than MAX_RUPEES.
+    """
+    try:
+        # str() first so a float like 0.1 is read as written, not as its
+        # binary approximation
+        rupees = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not rupees.is_finite() or abs(rupees) > MAX_RUPEES:
+        raise ValueError(f"Invalid amount: {value!r}")
+    try:
+        return int((rupees * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except ArithmeticError:
+        raise ValueError(f"Invalid amount: {value!r}")
+
+
+def format_amount(paise):
+    """
+    Returns an amount in paise as rupees with two decimals, e.g. 12345 -> '123.45'
+    """
+    sign = "-" if paise < 0 else ""
+    rupees, remainder = divmod(abs(int(round(paise))), 100)
+    return f"{sign}{rupees}.{remainder:02d}"
+
+
+def with_paise(transaction):
+    """
+    Returns the transaction with a float 'amount' in rupees (the original
+    format) replaced by an int 'paise' field
+    """
+    if 'paise' not in transaction:
+        transaction['paise'] = to_paise(transaction.pop('amount', 0))
+    return transaction
+
+
+def scale_paise(paise, factor):
+    """
+    Returns an amount in paise multiplied by factor (text, int or float),
+    rounded to the nearest paisa. Raises ValueError if factor isn't a number
+    or the result would be bigger than MAX_RUPEES.
+    """
+    try:
+        scale = Decimal(str(factor).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid factor: {factor!r}")
+    if not scale.is_finite() or abs(paise * scale) > MAX_PAISE:
+        raise ValueError(f"Invalid factor: {factor!r}")
+    try:
+        return int((paise * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except ArithmeticError:
+        raise ValueError(f"Invalid factor: {factor!r}")
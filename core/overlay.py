@@ -0,0 +1,89 @@
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.graphics import Color, Rectangle
+from kivy.uix.label import Label
+from core import metrics
+from core.store import open_stores
+
+# Key code Kivy reports for F12
+TOGGLE_KEY = 293
+
+
+class DebugOverlay(Label):
+    """
+    Semi-transparent panel over the whole window listing the recorded
+    timings (see core.metrics), frame stalls and each open store's query
+    cache counters (see core.cache). F12 shows and hides it;
+    while shown it refreshes twice a second.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            color=(1, 1, 1, 1),
+            font_size='14sp',
+            halign='left',
+            valign='top',
+            font_name='RobotoMono-Regular',
+            **kwargs
+        )
+        with self.canvas.before:
+            Color(0, 0, 0, 0.7)
+            self.background = Rectangle()
+        self.bind(pos=self.update_background, size=self.update_background)
+        self.event = None
+
+    def update_background(self, *args):
+        self.background.pos = self.pos
+        self.background.size = self.size
+        self.text_size = (self.width - 20, self.height - 20)
+
+    def toggle(self):
+        if self.parent:
+            Window.remove_widget(self)
+            self.event.cancel()
+            self.event = None
+        else:
+            self.size = Window.size
+            Window.add_widget(self)
+            self.refresh()
+            self.event = Clock.schedule_interval(self.refresh, 0.5)
+
+    def refresh(self, *args):
+        monitor = metrics.frame_monitor
+        lines = [
+            f"Frames: {monitor.frames}   stalls > {monitor.STALL_MS} ms: {monitor.stalls}"
+            f"   worst: {monitor.worst_ms:.0f} ms",
+            "",
+            f"{'timing':<24}{'count':>7}{'last':>9}{'p50':>9}{'p95':>9}{'max':>9}  (ms)",
+        ]
+        for name, stats in sorted(metrics.summary().items()):
+            lines.append(
+                f"{name:<24}{stats['count']:>7}{stats['last_ms']:>9.1f}{stats['p50_ms']:>9.1f}"
+                f"{stats['p95_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+            )
+        lines += ["", f"{'query cache':<24}{'hits':>7}{'misses':>9}{'hit %':>9}{'dropped':>9}{'size':>9}"]
+        for username, store in sorted(open_stores().items()):
+            stats = store.cache.stats()
+            lines.append(
+                f"{username:<24}{stats['hits']:>7}{stats['misses']:>9}{stats['hit_rate'] * 100:>9.1f}"
+                f"{stats['invalidations']:>9}{stats['size']:>9}"
+            )
+        self.text = "\n".join(lines)
+
+
+def install():
+    """
+    Start the frame monitor and bind F12 to the debug overlay
+    """
+    overlay = DebugOverlay(size_hint=(None, None))
+    Window.bind(size=lambda window, size: setattr(overlay, 'size', size))
+
+    def on_key_down(window, key, *args):
+        if key == TOGGLE_KEY:
+            overlay.toggle()
+            return True
+        return False
+
+    Window.bind(on_key_down=on_key_down)
+    metrics.frame_monitor.start()
+    return overlay
@@ -0,0 +1,222 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from core.models import expense_key
+
+# Search over expense names.
+#
+# A user has far fewer distinct expense names than transactions, so the
+# index is kept per name (its casefolded key, see core.models) rather than
+# per transaction. Each name has an ExpenseName entry with its running
+# count and total, and the days it was spent on with a total for each, in
+# order, so its spending over a date range is two binary searches away.
+# Names are found by:
+#   - prefix:    binary search in the sorted list of keys
+#   - substring: the keys holding every trigram of the query (for queries
+#                of three or more characters), then checked with 'in'
+#   - fuzzy:     the keys sharing trigrams with the query, ranked by how
+#                many they share (Dice coefficient), to forgive typos
+# TransactionStore builds the index on the first search and keeps it up to
+# date on every insert, edit and delete after that.
+
+# Lowest trigram similarity (0 to 1) for a fuzzy match
+FUZZY_THRESHOLD = 0.4
+
+# Match kinds, best first
+MATCH_KINDS = ('exact', 'prefix', 'substring', 'fuzzy')
+
+
+def trigrams(text):
+    """
+    Returns the set of three-character slices of a key, padded so that the
+    start and end of a name count too
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ExpenseName:
+    """
+    Everything spent under one expense name (ignoring case)
+    """
+
+    __slots__ = ('name', 'count', 'paise', 'days', 'day_counts', 'day_paise')
+
+    def __init__(self, name):
+        self.name = name                # how it was first written
+        self.count = 0
+        self.paise = 0
+        self.days = []                  # sorted day numbers with this expense
+        self.day_counts = {}            # ordinal -> transactions that day
+        self.day_paise = {}             # ordinal -> total paise that day
+
+    def days_in_range(self, start=None, end=None):
+        """
+        Returns the day numbers with this expense from start to end
+        (inclusive day numbers, None for open-ended), in order
+        """
+        low = bisect_left(self.days, start) if start is not None else 0
+        high = bisect_right(self.days, end) if end is not None else len(self.days)
+        return self.days[low:high]
+
+    def range_total(self, start=None, end=None):
+        """
+        Returns (count, total paise) from start to end (see days_in_range)
+        """
+        if start is None and end is None:
+            return self.count, self.paise
+        days = self.days_in_range(start, end)
+        return (
+            sum(self.day_counts[ordinal] for ordinal in days),
+            sum(self.day_paise[ordinal] for ordinal in days),
+        )
+
+
+class SearchIndex:
+    """
+    Index of a store's expense names for prefix, substring and fuzzy search.
+    Not thread safe on its own; the store calls it under its lock.
+    """
+
+    def __init__(self):
+        self.names = {}                     # key -> ExpenseName
+        self.keys = []                      # sorted keys, for prefix search
+        self.by_trigram = defaultdict(set)  # trigram -> {key}
+
+    def add(self, transaction, sort=True):
+        """
+        Count a transaction under its name. Pass sort=False while building,
+        then call finish().
+        """
+        key = transaction.key
+        entry = self.names.get(key)
+        if entry is None:
+            entry = self.names[key] = ExpenseName(transaction.expense)
+            if sort:
+                insort(self.keys, key)
+            for trigram in trigrams(key):
+                self.by_trigram[trigram].add(key)
+
+        ordinal = transaction.ordinal
+        if ordinal not in entry.day_counts:
+            if sort:
+                insort(entry.days, ordinal)
+            else:
+                entry.days.append(ordinal)
+            entry.day_counts[ordinal] = 0
+            entry.day_paise[ordinal] = 0
+        entry.day_counts[ordinal] += 1
+        entry.day_paise[ordinal] += transaction.paise
+        entry.count += 1
+        entry.paise += transaction.paise
+
+    def finish(self):
+        """
+        Sort the key and day lists after adding with sort=False
+        """
+        self.keys = sorted(self.names)
+        for entry in self.names.values():
+            entry.days.sort()
+
+    def remove(self, transaction):
+        """
+        Take a transaction out from under its name, e.g. before it is
+        deleted or renamed
+        """
+        key = transaction.key
+        entry = self.names[key]
+        ordinal = transaction.ordinal
+        entry.day_counts[ordinal] -= 1
+        entry.day_paise[ordinal] -= transaction.paise
+        if not entry.day_counts[ordinal]:
+            del entry.day_counts[ordinal]
+            del entry.day_paise[ordinal]
+            del entry.days[bisect_left(entry.days, ordinal)]
+        entry.count -= 1
+        entry.paise -= transaction.paise
+
+        if not entry.count:
+            del self.names[key]
+            del self.keys[bisect_left(self.keys, key)]
+            for trigram in trigrams(key):
+                keys = self.by_trigram[trigram]
+                keys.discard(key)
+                if not keys:
+                    del self.by_trigram[trigram]
+
+    def adjust(self, transaction, paise):
+        """
+        Move a transaction's name totals by a change in its amount
+        """
+        entry = self.names[transaction.key]
+        entry.day_paise[transaction.ordinal] += paise
+        entry.paise += paise
+
+    def get(self, expense):
+        """
+        Returns the ExpenseName for a name (ignoring case), or None
+        """
+        return self.names.get(expense_key(expense))
+
+    def prefix_keys(self, query):
+        """
+        Returns the keys starting with query, in order
+        """
+        start = bisect_left(self.keys, query)
+        matches = []
+        for key in self.keys[start:]:
+            if not key.startswith(query):
+                break
+            matches.append(key)
+        return matches
+
+    def substring_keys(self, query):
+        """
+        Returns the keys containing query
+        """
+        if len(query) < 3:
+            # Too short to have a trigram of its own; names are few enough to check
+            return [key for key in self.names if query in key]
+        query_trigrams = {query[i:i + 3] for i in range(len(query) - 2)}
+        postings = sorted((self.by_trigram.get(trigram, ()) for trigram in query_trigrams), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return [key for key in candidates if query in key]
+
+    def fuzzy_keys(self, query, threshold=FUZZY_THRESHOLD):
+        """
+        Returns [(similarity, key)] for keys sharing enough trigrams with the
+        query, most similar first
+        """
+        query_trigrams = trigrams(query)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for key in self.by_trigram.get(trigram, ()):
+                shared[key] += 1
+        scored = []
+        for key, count in shared.items():
+            similarity = 2 * count / (len(query_trigrams) + len(trigrams(key)))
+            if similarity >= threshold:
+                scored.append((similarity, key))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored
+
+    def search(self, query, fuzzy=True):
+        """
+        Returns [(match kind, key)] for names matching a query, ignoring
+        case: the exact name, then names starting with it, then names
+        containing it, then (if fuzzy) names spelled nearly like it. Each
+        name appears once, under its best kind of match.
+        """
+        query = expense_key(query.strip())
+        if not query:
+            return []
+        found = {}
+        if query in self.names:
+            found[query] = 'exact'
+        for key in self.prefix_keys(query):
+            found.setdefault(key, 'prefix')
+        for key in self.substring_keys(query):
+            found.setdefault(key, 'substring')
+        if fuzzy:
+            for _, key in self.fuzzy_keys(query):
+                found.setdefault(key, 'fuzzy')
+        return [(kind, key) for key, kind in found.items()]
@@ -0,0 +1,372 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs, unquote
+import argparse
+import asyncio
+import json
+import time
+from core import ledger
+from core.accounts import get_accounts
+from core.dates import date_ordinal, format_date, format_month, month_of
+from core.edits import apply_edit_list
+from core.metrics import timer, record
+from core.money import format_amount
+from core.store import get_store
+
+# A small JSON-over-HTTP service for the ledger operations (see core.ledger),
+# so many users can be served, and load-tested, without the app:
+#
+#   python -m core.server [--host 127.0.0.1] [--port 8750] [--workers 8]
+#
+#   GET  /users/<name>/day?date=DD/MM/YYYY      transactions and total for a date
+#   GET  /users/<name>/month?month=MM/YYYY      a month grouped by date, top expenses
+#   GET  /users/<name>/total?month=MM/YYYY      a month's total
+#   GET  /users/<name>/report?from=..&to=..     a date range by month, top expenses
+#   GET  /users/<name>/report?period=year       ... or a period: 30 days, 90 days, quarter, year
+#   GET  /users/<name>/search?q=fuel            expense names matching, with totals
+#                                               (&from=, &to=, &limit=, &rows= optional)
+#   GET  /users/<name>/forecast?month=MM/YYYY   month-end projections against the budget (&budget=)
+#   POST /users/<name>/duplicates               {"date", "expenses": [names]}
+#   POST /users/<name>/transactions             {"date", "entries": [{"expense", "amount"}], "budget"?}
+#   POST /users/<name>/update                   {"expense", "date", "end"?, "new_expense"?, "amount"?, "scale"?}
+#   POST /users/<name>/delete                   {"expense", "date", "end"?}
+#   POST /users/<name>/edits                    [edits, as for core.edits.apply_edit_list]
+#
+# Amounts are sent and returned as rupee strings ("12.50"). Errors come back
+# as {"error": message}, with 400 for a bad request, 404 for an unknown
+# user or path, and 413 (closing the connection) for a body over MAX_BODY.
+# There is no login: only accounts that exist are served, and the server
+# listens on localhost unless told otherwise.
+#
+# The event loop only parses requests. The ledger calls run on a pool of
+# worker threads against the same shared per-user stores the app uses, and
+# a user's writes are queued behind an asyncio lock per user, so one busy
+# user never ties up more than one worker while others are served. The
+# time spent queued is recorded as 'server.lock_wait'. Other processes
+# writing the same users are kept in step by the storage layer's file locks
+# (see core.filelock). Connections are kept alive between requests.
+
+DEFAULT_PORT = 8750
+MAX_BODY = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    """
+    A request's Content-Length is over MAX_BODY
+    """
+
+
+class LedgerServer:
+    """
+    Routes HTTP requests to the ledger functions
+    """
+
+    def __init__(self, workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ledger')
+        self.user_locks = defaultdict(asyncio.Lock)
+        self.routes = {
+            ('GET', 'day'): self.day,
+            ('GET', 'month'): self.month,
+            ('GET', 'total'): self.total,
+            ('GET', 'report'): self.report,
+            ('GET', 'search'): self.search,
+            ('GET', 'forecast'): self.forecast,
+            ('POST', 'duplicates'): self.duplicates,
+            ('POST', 'transactions'): self.save,
+            ('POST', 'update'): self.update,
+            ('POST', 'delete'): self.delete,
+            ('POST', 'edits'): self.edits,
+        }
+        # Requests that change a user's data, run one at a time per user
+        self.writes = {'transactions', 'update', 'delete', 'edits'}
+        # Requests whose body is a JSON list; every other body is an object
+        self.list_bodies = {'edits'}
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """
+        Start listening; returns the asyncio server
+        """
+        # Read the accounts file now rather than on the first request
+        await asyncio.get_running_loop().run_in_executor(self.executor, get_accounts)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve requests on one connection until the client closes it
+        """
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except ValueError:
+                    self.write_response(writer, HTTPStatus.BAD_REQUEST, {'error': "Malformed request"}, False)
+                    await writer.drain()
+                    break
+                except BodyTooLarge:
+                    # The body is left unread, so the connection can't be reused
+                    self.write_response(
+                        writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        {'error': f"Body is over {MAX_BODY} bytes"}, False
+                    )
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """
+        Returns (method, target, headers, body) for the next request, or
+        None when the connection is closed. Raises ValueError for a
+        malformed request and BodyTooLarge for one over MAX_BODY.
+        """
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0) or 0)
+        if length < 0:
+            raise ValueError("Negative Content-Length")
+        if length > MAX_BODY:
+            raise BodyTooLarge(length)
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    def write_response(self, writer, status, payload, keep_alive):
+        """
+        Send a JSON response
+        """
+        body = json.dumps(payload).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+    async def dispatch(self, method, target, body):
+        """
+        Run the handler for a request. Returns (HTTPStatus, JSON payload).
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if len(parts) != 3 or parts[0] != 'users' or (method, parts[2]) not in self.routes:
+            return HTTPStatus.NOT_FOUND, {'error': "Unknown path"}
+        _, username, action = parts
+        handler = self.routes[(method, action)]
+
+        try:
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': "Body is not valid JSON"}
+        if action in self.list_bodies and not isinstance(data, list):
+            return HTTPStatus.BAD_REQUEST, {'error': "Body must be a JSON list"}
+        if action not in self.list_bodies and not isinstance(data, dict):
+            return HTTPStatus.BAD_REQUEST, {'error': "Body must be a JSON object"}
+
+        loop = asyncio.get_running_loop()
+        # exists() reloads the accounts file if another process has
+        # registered someone, so it runs on a worker thread, not the loop
+        if not await loop.run_in_executor(self.executor, get_accounts().exists, username):
+            return HTTPStatus.NOT_FOUND, {'error': f"No user named {username!r}"}
+
+        work = partial(self.run, handler, username, action, params, data)
+        try:
+            if action in self.writes:
+                waited = time.perf_counter()
+                async with self.user_locks[username]:
+                    record('server.lock_wait', (time.perf_counter() - waited) * 1000, user=username)
+                    return await loop.run_in_executor(self.executor, work)
+            return await loop.run_in_executor(self.executor, work)
+        except (ValueError, KeyError, TypeError) as e:
+            # Missing fields come through as KeyError or TypeError
+            message = str(e) if isinstance(e, ValueError) else f"Missing or invalid field: {e}"
+            return HTTPStatus.BAD_REQUEST, {'error': message}
+        except Exception as e:
+            print(f"Error handling {method} {target}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal error"}
+
+    def run(self, handler, username, action, params, data):
+        """
+        Call a handler with the user's store, on a worker thread
+        """
+        with timer(f'server.{action}', user=username):
+            return handler(get_store(username), params, data)
+
+    # Handlers: each returns (HTTPStatus, payload) and raises ValueError for a bad request
+
+    def day(self, store, params, data):
+        date = params['date']
+        if date_ordinal(date) is None:
+            raise ValueError("Please enter a date in DD/MM/YYYY format")
+        transactions, total = ledger.day_transactions(store, date)
+        return HTTPStatus.OK, {
+            'date': date,
+            'transactions': [transaction_json(transaction) for transaction in transactions],
+            'total': format_amount(total),
+        }
+
+    def month(self, store, params, data):
+        month = params['month']
+        ledger.check_month(month)
+        summary = ledger.month_summary(store, month)
+        return HTTPStatus.OK, {
+            'month': month,
+            'days': [
+                {
+                    'date': format_date(ordinal),
+                    'transactions': [transaction_json(transaction) for transaction in transactions],
+                    'total': format_amount(total),
+                }
+                for ordinal, transactions, total in summary['days']
+            ],
+            'top_expenses': [[name, format_amount(total)] for name, total in summary['top_expenses']],
+            'total': format_amount(summary['total']),
+        }
+
+    def total(self, store, params, data):
+        month = params['month']
+        ledger.check_month(month)
+        return HTTPStatus.OK, {'month': month, 'total': format_amount(ledger.monthly_total(store, month))}
+
+    def report(self, store, params, data):
+        if 'period' in params:
+            start, end = ledger.period_range(params['period'])
+        else:
+            start, end = params['from'], params['to']
+        report = ledger.range_report(store, start, end)
+        return HTTPStatus.OK, {
+            'from': format_date(report['start']),
+            'to': format_date(report['end']),
+            'months': [[format_month(month), format_amount(total)] for month, total in report['months']],
+            'top_expenses': [[name, format_amount(total)] for name, total in report['top_expenses']],
+            'total': format_amount(report['total']),
+            'count': report['count'],
+            'days': report['days'],
+        }
+
+    def search(self, store, params, data):
+        results = ledger.search_expenses(
+            store, params['q'], params.get('from'), params.get('to'),
+            limit=int(params.get('limit', 20)), rows=int(params.get('rows', 0))
+        )
+        matches = []
+        for match in results['matches']:
+            match_json = dict(match, total=format_amount(match['total']))
+            if 'transactions' in match:
+                match_json['transactions'] = [transaction_json(transaction) for transaction in match['transactions']]
+            matches.append(match_json)
+        return HTTPStatus.OK, {
+            'query': params['q'],
+            'matches': matches,
+            'count': results['count'],
+            'total': format_amount(results['total']),
+        }
+
+    def duplicates(self, store, params, data):
+        expenses = data['expenses']
+        if not isinstance(expenses, list) or not all(isinstance(expense, str) for expense in expenses):
+            raise ValueError("'expenses' must be a list of names")
+        _, name = ledger.check_duplicates(store, data['date'], expenses)
+        return HTTPStatus.OK, {'duplicate': name}
+
+    def forecast(self, store, params, data):
+        month = params['month']
+        forecast = ledger.budget_forecast(store, month, user_budget(store, params.get('budget')))
+        return HTTPStatus.OK, {
+            'month': month,
+            'cumulative': [[format_date(ordinal), format_amount(spent)] for ordinal, spent in forecast['cumulative']],
+            'daily': format_amount(forecast['daily']) if forecast['daily'] is not None else None,
+            'warning': forecast['warning'],
+            **{
+                name: format_amount(forecast[name])
+                for name in ('spent', 'total', 'linear', 'weekday', 'projected', 'budget')
+            },
+        }
+
+    def save(self, store, params, data):
+        budget = user_budget(store, data.get('budget'))
+        entries = [(entry['expense'], entry['amount']) for entry in data['entries']]
+        doc_ids = ledger.save_transactions(store, data['date'], entries, budget)
+        # Warn, as the app does, if the month is heading over budget
+        forecast = ledger.budget_forecast(store, month_of(data['date']), budget)
+        return HTTPStatus.CREATED, {'ids': doc_ids, 'warning': forecast['warning']}
+
+    def update(self, store, params, data):
+        updated = ledger.update_expense(
+            store, data['expense'], data['date'], data.get('end'),
+            new_expense=data.get('new_expense', ''),
+            amount=str(data.get('amount', '')),
+            scale=str(data.get('scale', ''))
+        )
+        return HTTPStatus.OK, {'updated': updated}
+
+    def delete(self, store, params, data):
+        deleted = ledger.delete_expense(store, data['expense'], data['date'], data.get('end'))
+        return HTTPStatus.OK, {'deleted': deleted}
+
+    def edits(self, store, params, data):
+        return HTTPStatus.OK, {'changed': apply_edit_list(store, data)}
+
+
+def user_budget(store, budget=None):
+    """
+    Returns the budget given in a request, else the one the user last saved
+    in the app, in rupees
+    """
+    if budget is None:
+        budget = store.backend.load_settings().get('budget', ledger.DEFAULT_BUDGET)
+    return float(budget)
+
+
+def transaction_json(transaction):
+    """
+    Returns the JSON form of a Transaction
+    """
+    return {
+        'id': transaction.id,
+        'date': transaction.date,
+        'expense': transaction.expense,
+        'amount': format_amount(transaction.paise),
+    }
+
+
+async def serve(host, port, workers):
+    server = await LedgerServer(workers).start(host, port)
+    print(f"Serving the ledger on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the expense ledger over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=8, help="threads running ledger calls")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
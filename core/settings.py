@@ -0,0 +1,76 @@
+from kivy.clock import Clock
+from core.store import get_store
+import threading
+
+# One settings service per username, shared by every screen in the process
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_settings(username):
+    """
+    Return the shared settings service for a user, loading it on first use
+    """
+    with _services_lock:
+        service = _services.get(username)
+        if service is None:
+            service = SettingsService(get_store(username).backend)
+            _services[username] = service
+        return service
+
+
+def flush_all():
+    """
+    Write any pending settings changes for every user
+    """
+    with _services_lock:
+        services = list(_services.values())
+    for service in services:
+        service.flush()
+
+
+class SettingsService:
+    """
+    Cached user settings with debounced writes.
+
+    Changes are kept in memory and written DEBOUNCE seconds after the last
+    one, so typing into a field costs one write instead of one per key
+    press. Nothing is written if the values match what is already saved.
+    """
+
+    DEBOUNCE = 1.0
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.settings = backend.load_settings()
+        self.saved = dict(self.settings)
+        self._flush_trigger = Clock.create_trigger(lambda dt: self.flush(), self.DEBOUNCE)
+
+    def get(self, key, default=None):
+        """
+        Returns a setting from the in-memory copy
+        """
+        return self.settings.get(key, default)
+
+    def set(self, key, value):
+        """
+        Change a setting and schedule a write
+        """
+        self.settings[key] = value
+        # Restart the countdown so rapid edits are coalesced into one write
+        self._flush_trigger.cancel()
+        if self.settings != self.saved:
+            self._flush_trigger()
+
+    def flush(self):
+        """
+        Write the settings now if they differ from the saved copy
+        """
+        self._flush_trigger.cancel()
+        if self.settings == self.saved:
+            return
+        try:
+            self.backend.save_settings(dict(self.settings))
+            self.saved = dict(self.settings)
+        except Exception as e:
+            print(f"Error saving settings: {e}")
@@ -0,0 +1,485 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from contextlib import contextmanager
+from core.backends import get_backend
+from core.cache import QueryCache
+from core.dates import date_ordinal, month_key, format_date, format_month, with_date_keys
+from core.forecast import MonthForecast
+from core.metrics import timer
+from core.models import Transaction, expense_key
+from core.money import format_amount, with_paise
+from core.search import SearchIndex
+import argparse
+import threading
+
+# One store per username, shared by every screen in the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def as_ordinal(date):
+    """
+    Returns the day number for a DD/MM/YYYY string or an existing day number
+    """
+    return date if isinstance(date, int) else date_ordinal(date)
+
+
+def as_month_key(month):
+    """
+    Returns the YYYYMM key for a MM/YYYY string or an existing month key
+    """
+    return month if isinstance(month, int) else month_key(month)
+
+
+def get_store(username):
+    """
+    Return the shared transaction store for a user, loading it on first use
+    and reloading it if another process has written since
+    """
+    with _stores_lock:
+        store = _stores.get(username)
+        if store is None:
+            with timer('store.open', user=username):
+                store = TransactionStore(username)
+            _stores[username] = store
+            return store
+    store.refresh()
+    return store
+
+
+def open_stores():
+    """
+    Returns the stores loaded so far in this process, by username
+    """
+    with _stores_lock:
+        return dict(_stores)
+
+
+class TransactionStore:
+    """
+    In-memory copy of a user's transactions, indexed by date and by month.
+
+    The user's storage backend is read once when the store is created;
+    afterwards reads are served from the indexes and writes go to both
+    memory and the backend. Every record carries its date as a day number
+    and its month as a YYYYMM integer (see core.dates), and the indexes are
+    keyed by those, so dates are parsed once rather than on every lookup.
+    Amounts are int paise (see core.money), so running totals are exact.
+    Records are held as slotted Transaction objects (see core.models).
+    Running totals per month and per day are kept alongside the indexes and
+    adjusted on every insert and update, so budget checks never re-sum rows.
+    A count of (date, casefolded name) pairs makes duplicate checks a single
+    hash lookup. self.days lists every day number that has transactions, in
+    order, so a date range is found with two binary searches instead of a
+    scan of every day. self.search indexes the expense names for search (see
+    core.search); it is built on first use and kept up to date by every
+    write after that, as is self.forecast, the day-by-day spending of the
+    month last forecast (see core.forecast). All access goes through a
+    lock, since screens read the store from worker threads. Screens cache
+    their query results in self.cache; every write invalidates the dates
+    and months it touched.
+
+    Other processes (a second app window, the importer, the HTTP service)
+    may write the same user's files. The store remembers the version number
+    of the data it loaded (see core.filelock); reads go ahead without
+    locking, and refresh() reloads only if the version has moved on. Writes
+    run inside writing(), which holds the user's file lock and catches up
+    first, so their checks always see every other process's changes.
+    """
+
+    def __init__(self, username):
+        self.username = username
+        self.backend = get_backend(username)
+        self.lock = threading.RLock()
+        self.cache = QueryCache()
+        self.version = 0                    # bumped on every change
+        self.disk_version = None            # backend version last loaded or written
+        self.transactions = {}              # doc_id -> Transaction
+        self.by_date = defaultdict(list)    # ordinal -> [doc_id]
+        self.by_month = defaultdict(list)   # month_key -> [doc_id]
+        self.days = []                      # sorted day numbers in by_date
+        self.month_totals = defaultdict(int)    # month_key -> total paise
+        self.day_totals = defaultdict(int)      # ordinal -> total paise
+        self.expense_keys = defaultdict(int)    # (ordinal, expense_key) -> count
+        self.search = None                      # SearchIndex, built on first use
+        self.forecast = None                    # MonthForecast, built on first use
+        self.load()
+
+    def load(self):
+        """
+        Read every transaction from the backend and rebuild the indexes
+        """
+        with self.lock, self.backend.file_lock:
+            self.transactions.clear()
+            self.by_date.clear()
+            self.by_month.clear()
+            self.days = []
+            self.month_totals.clear()
+            self.day_totals.clear()
+            self.expense_keys.clear()
+            self.search = None
+            self.forecast = None
+
+            with timer('store.read', user=self.username):
+                records = self.backend.load_transactions()
+                self.disk_version = self.backend.file_lock.read_version()
+            with timer('store.index', user=self.username, rows=len(records)):
+                for doc_id, record in records:
+                    # Records saved in an older format are upgraded here
+                    self._index(doc_id, Transaction.from_record(doc_id, record), sort=False)
+                self.days = sorted(self.by_date)
+            self.version += 1
+            self.cache.clear()
+
+    def refresh(self):
+        """
+        Reload if another process has written since this store last loaded
+        or wrote. Returns True if it reloaded.
+        """
+        if self.backend.file_lock.read_version() == self.disk_version:
+            return False
+        with self.lock, self.backend.file_lock:
+            # Checked again now that no one can be writing
+            if self.backend.file_lock.read_version() == self.disk_version:
+                return False
+            with timer('store.reload', user=self.username):
+                self.load()
+            return True
+
+    @contextmanager
+    def writing(self):
+        """
+        Hold the store's lock and the user's file lock, after catching up
+        with other processes' writes. Checks and the writes they guard go
+        inside one with block, e.g. the budget check and the insert.
+        """
+        with self.lock, self.backend.file_lock:
+            self.refresh()
+            yield self
+            self.disk_version = self.backend.file_lock.read_version()
+
+    def _index(self, doc_id, transaction, sort=True):
+        """
+        Add a single transaction to the in-memory indexes. load() passes
+        sort=False and sorts self.days once at the end.
+        """
+        self.transactions[doc_id] = transaction
+        ordinal = transaction.ordinal
+        if ordinal is not None:
+            if sort and ordinal not in self.by_date:
+                insort(self.days, ordinal)
+            self.by_date[ordinal].append(doc_id)
+            self.by_month[transaction.month_key].append(doc_id)
+            self._add_to_totals(transaction, transaction.paise)
+            self.expense_keys[(ordinal, transaction.key)] += 1
+            if self.search is not None:
+                self.search.add(transaction)
+
+    def _add_to_totals(self, transaction, paise):
+        """
+        Adjust the running totals for the transaction's day and month by an
+        amount in paise (may be negative)
+        """
+        self.day_totals[transaction.ordinal] += paise
+        self.month_totals[transaction.month_key] += paise
+        if self.forecast is not None:
+            self.forecast.add(transaction.ordinal, paise)
+
+    def search_index(self):
+        """
+        Returns the SearchIndex of expense names, building it on first use
+        """
+        with self.lock:
+            if self.search is None:
+                with timer('store.search_index', user=self.username, rows=len(self.transactions)):
+                    search = SearchIndex()
+                    for transaction in self.transactions.values():
+                        if transaction.ordinal is not None:
+                            search.add(transaction, sort=False)
+                    search.finish()
+                self.search = search
+            return self.search
+
+    def month_forecast(self, month_year):
+        """
+        Returns the MonthForecast for a month (MM/YYYY or YYYYMM key),
+        building it if it isn't the month last asked about
+        """
+        key = as_month_key(month_year)
+        with self.lock:
+            if self.forecast is None or self.forecast.month_key != key:
+                self.forecast = MonthForecast(key, self.day_totals)
+            return self.forecast
+
+    def is_empty(self):
+        """
+        Returns True if the user has no stored transactions
+        """
+        with self.lock:
+            return not self.transactions
+
+    def for_date(self, date):
+        """
+        Returns the transactions recorded on a date (DD/MM/YYYY or day number)
+        """
+        with self.lock:
+            return [self.transactions[doc_id] for doc_id in self.by_date.get(as_ordinal(date), [])]
+
+    def for_month(self, month_year):
+        """
+        Returns the transactions recorded in a month (MM/YYYY or YYYYMM key)
+        """
+        with self.lock:
+            return [self.transactions[doc_id] for doc_id in self.by_month.get(as_month_key(month_year), [])]
+
+    def days_in_range(self, start=None, end=None):
+        """
+        Returns the day numbers with transactions from start to end
+        (inclusive; dates or day numbers, None for open-ended), in order
+        """
+        with self.lock:
+            low = bisect_left(self.days, as_ordinal(start)) if start is not None else 0
+            high = bisect_right(self.days, as_ordinal(end)) if end is not None else len(self.days)
+            return self.days[low:high]
+
+    def range_total(self, start=None, end=None):
+        """
+        Returns the total spent from start to end (see days_in_range)
+        """
+        with self.lock:
+            return sum(self.day_totals[ordinal] for ordinal in self.days_in_range(start, end))
+
+    def iter_range(self, start=None, end=None, chunk_size=1000):
+        """
+        Yields the transactions from start to end (inclusive; dates or day
+        numbers, None for open-ended) in date order, as lists of about
+        chunk_size. A day is never split between two lists. Only the days in
+        range are read, found by binary search in the sorted day list, and
+        the lock is held for one day at a time.
+        """
+        ordinals = self.days_in_range(start, end)
+
+        chunk = []
+        for ordinal in ordinals:
+            with self.lock:
+                chunk.extend(self.transactions[doc_id] for doc_id in self.by_date.get(ordinal, []))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def has_expense(self, date, expense):
+        """
+        Returns True if an expense with this name (ignoring case) exists on the date
+        """
+        with self.lock:
+            return self.expense_keys.get((as_ordinal(date), expense_key(expense)), 0) > 0
+
+    def month_total(self, month_year):
+        """
+        Returns the total spent in a month (MM/YYYY or YYYYMM key)
+        """
+        with self.lock:
+            return self.month_totals.get(as_month_key(month_year), 0)
+
+    def day_total(self, date):
+        """
+        Returns the total spent on a date (DD/MM/YYYY or day number)
+        """
+        with self.lock:
+            return self.day_totals.get(as_ordinal(date), 0)
+
+    def compute_totals(self):
+        """
+        Recompute day and month totals from the raw transactions.
+        Returns a tuple (day_totals, month_totals) of plain dicts.
+        """
+        with self.lock:
+            day_totals = defaultdict(int)
+            month_totals = defaultdict(int)
+            for transaction in self.transactions.values():
+                if transaction.ordinal is not None:
+                    day_totals[transaction.ordinal] += transaction.paise
+                    month_totals[transaction.month_key] += transaction.paise
+            return dict(day_totals), dict(month_totals)
+
+    def verify_totals(self):
+        """
+        Compare the running totals against a full recomputation.
+        Returns a list of (date_or_month, stored_total, actual_total) mismatches.
+        """
+        with self.lock:
+            day_totals, month_totals = self.compute_totals()
+            mismatches = []
+            for running, actual, label in ((self.day_totals, day_totals, format_date),
+                                           (self.month_totals, month_totals, format_month)):
+                for key in set(running) | set(actual):
+                    if running.get(key, 0) != actual.get(key, 0):
+                        mismatches.append((label(key), running.get(key, 0), actual.get(key, 0)))
+            return mismatches
+
+    def rebuild_totals(self):
+        """
+        Replace the running totals with a full recomputation
+        """
+        with self.lock:
+            day_totals, month_totals = self.compute_totals()
+            self.day_totals = defaultdict(int, day_totals)
+            self.month_totals = defaultdict(int, month_totals)
+            self.forecast = None
+            self.cache.clear()
+
+    def insert_multiple(self, transactions):
+        """
+        Save new transactions to the backend and add them to the indexes.
+        Amounts are given in 'paise' (a rupee 'amount' is converted). The date
+        keys are worked out here, once, and saved with each record, unless
+        the caller has already filled them in.
+        """
+        records = [dict(transaction) for transaction in transactions]
+        for record in records:
+            if 'ordinal' not in record:
+                with_date_keys(record)
+            with_paise(record)
+        with self.writing():
+            doc_ids = self.backend.insert_transactions(records)
+            for doc_id, record in zip(doc_ids, records):
+                self._index(doc_id, Transaction.from_record(doc_id, record))
+            self.version += 1
+            for ordinal in {record['ordinal'] for record in records}:
+                if ordinal is not None:
+                    self.cache.invalidate_date(ordinal)
+            return doc_ids
+
+    def find(self, expense=None, start=None, end=None):
+        """
+        Returns the transactions from start to end (inclusive; see
+        iter_range) whose name matches the expense, ignoring case, or every
+        transaction in range if no expense is given. A name searched for
+        over more than one day is looked up in the search index.
+        """
+        key = expense_key(expense) if expense is not None else None
+        if key is not None and (start is None or end is None or as_ordinal(start) != as_ordinal(end)):
+            # Over more than a day, only visit the days the name was spent on
+            with self.lock:
+                entry = self.search_index().names.get(key)
+                if entry is None:
+                    return []
+                days = entry.days_in_range(
+                    as_ordinal(start) if start is not None else None,
+                    as_ordinal(end) if end is not None else None
+                )
+                return [
+                    transaction
+                    for ordinal in days
+                    for transaction in map(self.transactions.get, self.by_date[ordinal])
+                    if transaction.key == key
+                ]
+        matches = []
+        for chunk in self.iter_range(start, end):
+            matches.extend(transaction for transaction in chunk if key is None or transaction.key == key)
+        return matches
+
+    def apply_changes(self, updates=(), deletes=()):
+        """
+        Apply a list of (doc_id, field changes) pairs, where the fields are
+        'expense' and/or 'paise', and delete a list of doc ids, as a single
+        write. Raises ValueError, before anything is written, if a doc id is
+        unknown or a rename would give two expenses on a date the same name.
+        """
+        updates = [(doc_id, dict(fields)) for doc_id, fields in updates]
+        deletes = list(dict.fromkeys(deletes))
+        with self.writing():
+            for doc_id in [doc_id for doc_id, _ in updates] + deletes:
+                if doc_id not in self.transactions:
+                    raise ValueError(f"No transaction with id {doc_id}")
+
+            # Work out the name counts the changes would leave behind
+            deleted = set(deletes)
+            counts = defaultdict(int)
+            names = {}
+            for doc_id in deletes:
+                transaction = self.transactions[doc_id]
+                counts[(transaction.ordinal, transaction.key)] -= 1
+            for doc_id, fields in updates:
+                transaction = self.transactions[doc_id]
+                if 'expense' in fields and doc_id not in deleted:
+                    new_key = (transaction.ordinal, expense_key(fields['expense']))
+                    counts[(transaction.ordinal, transaction.key)] -= 1
+                    counts[new_key] += 1
+                    names[new_key] = fields['expense']
+            for (ordinal, key), change in counts.items():
+                if change > 0 and ordinal is not None and self.expense_keys.get((ordinal, key), 0) + change > 1:
+                    raise ValueError(f"'{names[(ordinal, key)]}' already exists on {format_date(ordinal)}")
+
+            self.backend.apply_changes(updates, deletes)
+
+            touched = set()
+            for doc_id, fields in updates:
+                transaction = self.transactions[doc_id]
+                touched.add(transaction.ordinal)
+                if transaction.ordinal is None:
+                    transaction.paise = fields.get('paise', transaction.paise)
+                    if 'expense' in fields:
+                        transaction.rename(fields['expense'])
+                    continue
+                if 'paise' in fields:
+                    # Move the running totals by the change in amount
+                    self._add_to_totals(transaction, fields['paise'] - transaction.paise)
+                    if self.search is not None:
+                        self.search.adjust(transaction, fields['paise'] - transaction.paise)
+                    transaction.paise = fields['paise']
+                if 'expense' in fields:
+                    # Move the duplicate index and search entries to the new name
+                    self.expense_keys[(transaction.ordinal, transaction.key)] -= 1
+                    if self.search is not None:
+                        self.search.remove(transaction)
+                    transaction.rename(fields['expense'])
+                    self.expense_keys[(transaction.ordinal, transaction.key)] += 1
+                    if self.search is not None:
+                        self.search.add(transaction)
+            for doc_id in deletes:
+                transaction = self.transactions.pop(doc_id)
+                touched.add(transaction.ordinal)
+                if transaction.ordinal is not None:
+                    self._unindex(doc_id, transaction)
+
+            self.version += 1
+            for ordinal in touched:
+                if ordinal is not None:
+                    self.cache.invalidate_date(ordinal)
+
+    def _unindex(self, doc_id, transaction):
+        """
+        Remove a deleted transaction from the date and month indexes
+        """
+        self.by_date[transaction.ordinal].remove(doc_id)
+        if not self.by_date[transaction.ordinal]:
+            del self.by_date[transaction.ordinal]
+            del self.days[bisect_left(self.days, transaction.ordinal)]
+        self.by_month[transaction.month_key].remove(doc_id)
+        if not self.by_month[transaction.month_key]:
+            del self.by_month[transaction.month_key]
+        self._add_to_totals(transaction, -transaction.paise)
+        self.expense_keys[(transaction.ordinal, transaction.key)] -= 1
+        if self.search is not None:
+            self.search.remove(transaction)
+
+
+if __name__ == "__main__":
+    # Usage: python -m core.store {verify,rebuild} USERNAME
+    parser = argparse.ArgumentParser(description="Check or rebuild a user's running totals")
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('username')
+    args = parser.parse_args()
+
+    store = get_store(args.username)
+    if args.command == 'rebuild':
+        store.rebuild_totals()
+        print(f"Rebuilt totals for {len(store.month_totals)} months and {len(store.day_totals)} days")
+    else:
+        mismatches = store.verify_totals()
+        for key, stored, actual in mismatches:
+            print(f"{key}: running total {format_amount(stored)}, actual {format_amount(actual)}")
+        print("Totals OK" if not mismatches else f"{len(mismatches)} totals out of date")
@@ -1,25 +1,73 @@
+import time
+started = time.perf_counter()  # Before Kivy is imported, for the cold-start time
+
 from kivy.app import App
-from screens.login import Login
-from screens.register import Register
-from screens.home import Home
-from screens.view import View
-from screens.edit import Edit
-from screens.monthly import Monthly
+from kivy.graphics.texture import Texture
+from kivy.core.image import Image as CoreImage
+from kivy.core.window import Window
+from kivy.loader import Loader
 from kivy.uix.screenmanager import ScreenManager
+from core import metrics, overlay
+from core.settings import flush_all
+import importlib
 
 class ManageWindows(ScreenManager):
-    pass
+    """
+    Screen manager that builds each screen the first time it is shown or
+    asked for, so only the login screen is created at startup
+    """
+
+    # Screen name -> (module, class), imported on first use
+    SCREENS = {
+        'login': ('screens.login', 'Login'),
+        'register': ('screens.register', 'Register'),
+        'home': ('screens.home', 'Home'),
+        'view': ('screens.view', 'View'),
+        'edit': ('screens.edit', 'Edit'),
+        'monthly': ('screens.monthly', 'Monthly'),
+        'reports': ('screens.reports', 'Reports'),
+        'search': ('screens.search', 'Search'),
+    }
+
+    def get_screen(self, name):
+        if name in self.SCREENS and not super().has_screen(name):
+            module, class_name = self.SCREENS[name]
+            with metrics.timer('screen.build', screen=name):
+                screen_class = getattr(importlib.import_module(module), class_name)
+                self.add_widget(screen_class(name=name))
+        return super().get_screen(name)
+
+    def has_screen(self, name):
+        return name in self.SCREENS or super().has_screen(name)
 
 class FinanceTrackerApp(App):
     def build(self):
+        # Background images are decoded on the loader's threads (AsyncImage
+        # in the kv file); show nothing, rather than a spinner, until then
+        blank = Texture.create(size=(1, 1), colorfmt='rgba')
+        blank.blit_buffer(b'\x00\x00\x00\x00', colorfmt='rgba', bufferfmt='ubyte')
+        Loader.loading_image = CoreImage(blank)
+
         sm = ManageWindows()
-        sm.add_widget(Login(name="login"))
-        sm.add_widget(Register(name="register"))
-        sm.add_widget(Home(name="home"))
-        sm.add_widget(View(name="view"))
-        sm.add_widget(Edit(name="edit"))
-        sm.add_widget(Monthly(name="monthly"))
+        sm.current = 'login'
         return sm
 
+    def on_start(self):
+        # Report the time to the first drawn frame, so startup regressions show
+        Window.bind(on_flip=self.report_cold_start)
+        # F12 shows the timings recorded so far
+        overlay.install()
+
+    def report_cold_start(self, *args):
+        Window.unbind(on_flip=self.report_cold_start)
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.record('app.cold_start', elapsed)
+        print(f"Cold start: {elapsed:.0f} ms to first frame")
+
+    def on_stop(self):
+        # Write any settings changes still waiting on the debounce timer
+        flush_all()
+        metrics.flush()
+
 if __name__ == "__main__":
     FinanceTrackerApp().run()
@@ -1,11 +1,15 @@
 from kivy.uix.screenmanager import Screen
 from kivy.uix.label import Label
 from kivy.clock import Clock
-from tinydb import TinyDB, Query
 from datetime import datetime
-import os
+from core.ledger import find_matches, update_expense, delete_expense
+from core.metrics import timer, timed
+from core.store import get_store, expense_key
 
 class Edit(Screen):
+    # (username, expense key, start, end) of a delete waiting to be confirmed
+    pending_delete = None
+    
     def on_enter(self):
         """
         Set the date input to today's date when screen is entered
@@ -40,32 +44,15 @@ class Edit(Screen):
         # Remove label after 2 seconds
         Clock.schedule_once(lambda *args: self.remove_widget(feedback_label), 2)
     
-    def update_expense(self):
+    def read_inputs(self):
         """
-        Update an existing expense entry based on expense name and date
+        Returns (store, expense, start, end) from the date and expense fields,
+        or None after showing a message if the user can't be found. An empty
+        "to" date means the single date.
         """
-        # Get input values
         old_expense = self.ids['old_expense_input'].text.strip()
-        new_expense = self.ids['new_expense_input'].text.strip()
-        new_amount = self.ids['new_amount_input'].text.strip()
         search_date = self.ids['date_input'].text.strip()
-        
-        # Validate inputs
-        if not old_expense or not search_date:
-            self.display_message("Please enter existing expense and date", (1, 0, 0, 1))
-            return
-        
-        # If new expense is not provided, use the old expense
-        if not new_expense:
-            new_expense = old_expense
-        
-        # Validate amount if provided
-        if new_amount:
-            try:
-                new_amount = float(new_amount)
-            except ValueError:
-                self.display_message("Invalid amount. Please enter a number.", (1, 0, 0, 1))
-                return
+        end_date = self.ids['end_date_input'].text.strip() or search_date
         
         # Get username from login screen
         try:
@@ -73,45 +60,86 @@ class Edit(Screen):
         except Exception as e:
             print(f"Error fetching username: {e}")
             self.display_message("User not found", (1, 0, 0, 1))
-            return
+            return None
         
-        # Path to user's database
-        db_path = f'database/{username}_transactions.json'
-        
-        # Check if database exists
-        if not os.path.exists(db_path):
-            self.display_message("No transactions found", (1, 0, 0, 1))
+        # Open the user's shared transaction store
+        return get_store(username), old_expense, search_date, end_date
+    
+    def clear_inputs(self):
+        """
+        Clear the expense and amount fields after a change
+        """
+        for field in ('old_expense_input', 'new_expense_input', 'new_amount_input', 'scale_input', 'end_date_input'):
+            self.ids[field].text = ''
+        self.pending_delete = None
+    
+    @timed('edit.update')
+    def update_expense(self):
+        """
+        Update an existing expense by name on a date, or on every date of a
+        range: rename it, set its amount, or scale its amount. All matching
+        transactions are changed together in a single write.
+        """
+        inputs = self.read_inputs()
+        if inputs is None:
             return
+        store, old_expense, start, end = inputs
         
-        # Open the database
-        db = TinyDB(db_path)
+        try:
+            # Update the expense (case-insensitive) on every date in range
+            with timer('edit.apply'):
+                updated = update_expense(
+                    store, old_expense, start, end,
+                    new_expense=self.ids['new_expense_input'].text.strip(),
+                    amount=self.ids['new_amount_input'].text.strip(),
+                    scale=self.ids['scale_input'].text.strip()
+                )
+        except ValueError as e:
+            self.display_message(str(e), (1, 0, 0, 1))
+            return
         
-        # Create a query to find the expense
-        query = Query()
+        self.clear_inputs()
         
-        # Prepare update data
-        update_data = {}
-        if new_expense:
-            update_data['expense'] = new_expense
-        if new_amount:
-            update_data['amount'] = new_amount
+        # Display success message
+        if updated == 1:
+            self.display_message("Expense updated successfully!", (0, 1, 0, 1))
+        else:
+            self.display_message(f"{updated} expenses updated successfully!", (0, 1, 0, 1))
+    
+    def delete_expense(self):
+        """
+        Delete an expense by name on a date, or on every date of a range.
+        The first press only asks for confirmation; pressing again within a
+        few seconds, with the same fields, deletes.
+        """
+        inputs = self.read_inputs()
+        if inputs is None:
+            return
+        store, old_expense, start, end = inputs
         
-        # Find and update the expense (case-insensitive) for the specific date
-        updated = db.update(
-            update_data, 
-            (query.expense.test(lambda x: x.lower() == old_expense.lower())) & 
-            (query.date == search_date)
-        )
+        try:
+            count = len(find_matches(store, old_expense, start, end))
+        except ValueError as e:
+            self.display_message(str(e), (1, 0, 0, 1))
+            return
         
-        # Check if update was successful
-        if updated:
-            # Clear input fields
-            self.ids['old_expense_input'].text = ''
-            self.ids['new_expense_input'].text = ''
-            self.ids['new_amount_input'].text = ''
+        request = (store.username, expense_key(old_expense), start, end)
+        if self.pending_delete != request:
+            self.pending_delete = request
             
-            # Display success message
-            self.display_message("Expense updated successfully!", (0, 1, 0, 1))
-        else:
-            # Display error if no matching expense found
-            self.display_message("No matching expense found for the given date", (1, 0, 0, 1))
\ No newline at end of file
+            def expire(dt):
+                if self.pending_delete == request:
+                    self.pending_delete = None
+            
+            Clock.schedule_once(expire, 3)
+            self.display_message(f"Press Delete again to remove {count} expense(s)", (1, 0.5, 0, 1))
+            return
+        
+        try:
+            with timer('edit.delete'):
+                deleted = delete_expense(store, old_expense, start, end)
+        except ValueError as e:
+            self.display_message(str(e), (1, 0, 0, 1))
+            return
+        self.clear_inputs()
+        self.display_message(f"Deleted {deleted} expense(s)", (0, 1, 0, 1))
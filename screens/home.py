@@ -2,13 +2,27 @@ from kivy.uix.screenmanager import Screen
 from kivy.properties import StringProperty
 from kivy.uix.label import Label
 from kivy.clock import Clock
-from tinydb import TinyDB
 from datetime import datetime
-import os
+from functools import partial
+from core.dates import month_of
+from core.ledger import save_transactions, budget_forecast, DEFAULT_BUDGET
+from core.loader import BackgroundLoader
+from core.metrics import timed
+from core.money import format_amount
+from core.settings import get_settings
+from core.store import get_store
 
 class Home(Screen):
     current_username = StringProperty('')
 
+    def on_kv_post(self, base_widget):
+        """
+        Listen for budget edits once, rather than on every visit to the screen,
+        and create the loader that reads the user's data off the main thread
+        """
+        self.ids.budget_input.bind(text=self.on_budget_change)
+        self.loader = BackgroundLoader()
+
     def on_enter(self):
         """
         Called when the screen is entered. Fetch the username and set the budget.
@@ -17,35 +31,50 @@ class Home(Screen):
             self.current_username = self.manager.get_screen('login').username
             self.ids.date_input.text = self.get_today_date()
 
-            # Fetch the budget from the settings database
-            db_path = f'database/{self.current_username}_settings.json'
-            os.makedirs('database', exist_ok=True)
-            db = TinyDB(db_path)
-            user_settings = db.all()
-
-            if user_settings:
-                # Existing user: Set the budget to their saved integer value
-                self.ids.budget_input.text = str(int(user_settings[0].get('budget', 10000)))
-            else:
-                # New user: Set default budget to 10000
-                self.ids.budget_input.text = "10000"
-                db.insert({'budget': 10000})
-
-            # Add a listener to the budget input field to save changes
-            self.ids.budget_input.bind(text=self.on_budget_change)
+            # Loading the settings also loads the user's transaction store,
+            # so do it on a worker thread and fill in the budget afterwards
+            self.loader.load(
+                partial(get_settings, self.current_username),
+                self.show_budget,
+                lambda e: print(f"Error initializing budget: {e}")
+            )
         except Exception as e:
             print(f"Error initializing budget: {e}")
 
+    def show_budget(self, settings):
+        """
+        Set the budget field from the user's loaded settings
+        """
+        budget = settings.get('budget')
+
+        if budget is not None:
+            # Existing user: Set the budget to their saved integer value
+            self.ids.budget_input.text = str(int(budget))
+        else:
+            # New user: Set the default budget
+            self.ids.budget_input.text = str(DEFAULT_BUDGET)
+            settings.set('budget', DEFAULT_BUDGET)
+
+        # The store is loaded by now, so the forecast is quick
+        self.show_forecast(month_of(self.get_today_date()))
+
+    def on_leave(self):
+        """
+        Write any pending budget change before moving to another screen
+        """
+        if self.current_username:
+            get_settings(self.current_username).flush()
+
     def on_budget_change(self, instance, value):
         """
-        Save the updated budget whenever the text field is changed.
+        Record the updated budget whenever the text field is changed.
+        The settings service batches these into a single write.
         """
+        if not self.current_username:
+            return
         try:
             new_budget = int(value)
-            db_path = f'database/{self.current_username}_settings.json'
-            db = TinyDB(db_path)
-            db.truncate()  # Clear previous settings
-            db.insert({'budget': new_budget})
+            get_settings(self.current_username).set('budget', new_budget)
         except ValueError:
             print("Invalid budget value entered.")
         except Exception as e:
@@ -57,6 +86,7 @@ class Home(Screen):
         """
         return datetime.now().strftime("%d/%m/%Y")
 
+    @timed('home.save')
     def save_transactions(self):
         """
         Save transactions and update the budget if it's changed.
@@ -72,134 +102,58 @@ class Home(Screen):
             self.display_message("Please enter a valid budget amount", (1, 0, 0, 1))
             return
 
-        # Update the budget in the settings database
-        try:
-            db_path = f'database/{self.current_username}_settings.json'
-            db = TinyDB(db_path)
-            db.truncate()  # Clear previous settings
-            db.insert({'budget': new_budget})
-        except Exception as e:
-            print(f"Error saving budget: {e}")
-
-        # Process and save transactions
-        transactions = []
-        expense_dict = {}
-        current_transaction_total = 0
-        new_expenses = []
-
-        for i in range(1, 6):
-            expense = self.ids[f'expense{i}'].text.strip()
-            amount = self.ids[f'amount{i}'].text.strip()
-
-            if expense and amount:
-                new_expenses.append(expense)
-                try:
-                    amount = float(amount)
-                    current_transaction_total += amount
-                    expense_dict[expense.lower()] = {
-                        'date': self.ids['date_input'].text,
-                        'expense': expense,
-                        'amount': amount
-                    }
-                except ValueError:
-                    print(f"Invalid amount for expense {i}")
-
-        transactions = list(expense_dict.values())
-
-        if not transactions:
-            self.display_message("Please enter at least one expense and amount", (1, 0, 0, 1))
-            return
-
-        # Check for duplicate transactions
-        has_duplicate, duplicate_name = self.check_duplicate_transactions(
-            self.ids['date_input'].text,
-            new_expenses
-        )
-
-        if has_duplicate:
-            self.display_message(
-                f"Transaction '{duplicate_name}' already exists for today, please use a different name",
-                (1, 0, 0, 1)
-            )
-            return
-
-        # Get the month/year from the date
-        date = self.ids['date_input'].text
-        month_year = "/".join(date.split("/")[1:])
+        # Update the budget in the settings (only written if it changed)
+        get_settings(self.current_username).set('budget', new_budget)
 
-        # Calculate current monthly total
-        existing_monthly_total = self.get_monthly_total(month_year)
+        entries = [
+            (self.ids[f'expense{i}'].text, self.ids[f'amount{i}'].text)
+            for i in range(1, 6)
+        ]
 
-        # Check if this transaction would exceed the budget
-        if existing_monthly_total + current_transaction_total > new_budget:
-            self.display_message("Transaction failed: Monthly Budget Exceeded", (1, 0, 0, 1))
+        # Checks for duplicates and the monthly budget, then saves
+        try:
+            save_transactions(get_store(self.current_username), self.ids['date_input'].text, entries, new_budget)
+        except ValueError as e:
+            self.display_message(str(e), (1, 0, 0, 1))
             return
 
-        # If we get here, we're under budget - proceed with saving
-        os.makedirs('database', exist_ok=True)
-
-        # Create or open user-specific database file
-        db_path = f'database/{self.current_username}_transactions.json'
-        db = TinyDB(db_path)
-
-        # Insert transactions
-        db.insert_multiple(transactions)
-
         # Display success message
         self.display_message("Transaction saved successfully!", (0, 1, 0, 1))
 
+        # Warn if the month the expenses went into is heading over budget
+        self.show_forecast(month_of(self.ids['date_input'].text))
+
         # Clear input fields after saving
         self.clear_transaction_fields()
 
-    def get_monthly_total(self, month_year):
+    def show_forecast(self, month_year):
         """
-        Calculate total expenses for a given month
+        Show where a month's spending is heading against the budget, in red
+        if it is over or on course to go over
         """
-        if not self.current_username:
-            return 0
-
         try:
-            db_path = f'database/{self.current_username}_transactions.json'
-            db = TinyDB(db_path)
-
-            # Get all transactions
-            monthly_total = 0
-            for transaction in db.all():
-                date = transaction.get('date', '')
-                if date:
-                    # Extract month/year from date (DD/MM/YYYY format)
-                    transaction_month = "/".join(date.split("/")[1:])
-                    if transaction_month == month_year:
-                        monthly_total += transaction.get('amount', 0)
-
-            return monthly_total
+            budget = float(self.ids.budget_input.text)
+            forecast = budget_forecast(get_store(self.current_username), month_year, budget)
+        except ValueError:
+            self.ids.forecast_label.text = ''
+            return
         except Exception as e:
-            print(f"Error calculating monthly total: {e}")
-            return 0
-
-    def check_duplicate_transactions(self, date, expenses):
-        """
-        Check if any of the expenses already exist for the given date
-        Returns tuple (bool, str) - (is_duplicate, duplicate_expense_name)
-        """
-        try:
-            db_path = f'database/{self.current_username}_transactions.json'
-            db = TinyDB(db_path)
-
-            # Get all transactions for the date
-            existing_transactions = [t for t in db.all() if t.get('date') == date]
-
-            # Check each new expense against existing ones
-            for expense in expenses:
-                for existing in existing_transactions:
-                    if expense.lower() == existing.get('expense', '').lower():
-                        return True, expense
-
-            return False, None
+            print(f"Error forecasting spending: {e}")
+            self.ids.forecast_label.text = ''
+            return
 
-        except Exception as e:
-            print(f"Error checking duplicates: {e}")
-            return False, None
+        if forecast['warning']:
+            self.ids.forecast_label.text = forecast['warning']
+            self.ids.forecast_label.color = (1, 0, 0, 1)
+        elif forecast['daily'] is not None:
+            self.ids.forecast_label.text = (
+                f"{month_year}: on course for ₹{format_amount(forecast['projected'])}, "
+                f"₹{format_amount(forecast['daily'])} a day left"
+            )
+            self.ids.forecast_label.color = (0, 0, 0, 1)
+        else:
+            self.ids.forecast_label.text = f"{month_year}: spent ₹{format_amount(forecast['total'])}"
+            self.ids.forecast_label.color = (0, 0, 0, 1)
 
     def display_message(self, message, color):
         """
@@ -1,11 +1,9 @@
 from kivy.uix.screenmanager import Screen
 from kivy.uix.label import Label
 from kivy.clock import Clock
-from tinydb import TinyDB, Query
-
-# Initialize TinyDB database
-db = TinyDB('database/users.json')
-User = Query()
+from functools import partial
+from core.accounts import get_accounts
+from core.loader import BackgroundLoader
 
 class Login(Screen):
     username = ''  # Add this class variable to store the username
@@ -14,10 +12,20 @@ class Login(Screen):
         self.ids.username.text = ''
         self.ids.password.text = ''
 
+    def on_kv_post(self, base_widget):
+        # Password checks are slow on purpose, so they run on a worker thread
+        self.loader = BackgroundLoader()
+
     def login(self, username, password):
         # Check if the user exists and the password matches
-        user = db.search(User.username == username)
-        if user and user[0]['password'] == password:
+        self.loader.load(
+            partial(get_accounts().authenticate, username, password),
+            partial(self.finish_login, username),
+            self.show_login_error
+        )
+
+    def finish_login(self, username, authenticated):
+        if authenticated:
             # Store the username
             self.username = username
             
@@ -29,6 +37,10 @@ class Login(Screen):
             # Display error message for invalid credentials
             self.display_message("Invalid login credentials", (1, 0, 0, 1))  # Red color
 
+    def show_login_error(self, error):
+        print(f"Error checking login: {error}")
+        self.display_message("Invalid login credentials", (1, 0, 0, 1))  # Red color
+
     def display_message(self, message, color):
         # Create a label to display feedback
         feedback_label = Label(
@@ -1,15 +1,28 @@
 from kivy.uix.screenmanager import Screen
-from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
-from kivy.uix.scrollview import ScrollView
-from tinydb import TinyDB
 from kivy.clock import Clock
 from kivy.properties import StringProperty
-from collections import defaultdict
+from functools import partial
+import time
+from core.export import export_month
+from core.ledger import month_summary
+from core.loader import BackgroundLoader
+from core.metrics import timer, timed, record
+from core.money import format_amount
+from core.dates import month_of, month_key, format_date
+from core.store import get_store
 
 class Monthly(Screen):
     current_username = StringProperty('')
     
+    def on_kv_post(self, base_widget):
+        """
+        Create the loaders that read transactions off the main thread; exports
+        have their own so that showing another month doesn't cancel one
+        """
+        self.loader = BackgroundLoader()
+        self.export_loader = BackgroundLoader()
+    
     def on_enter(self):
         """
         Fetch the current username and default month for transactions
@@ -20,7 +33,7 @@ class Monthly(Screen):
             
             # Get current month from the date in Home screen
             default_date = self.manager.get_screen('home').ids.date_input.text
-            default_month = "/".join(default_date.split("/")[1:])  # Extract MM/YYYY
+            default_month = month_of(default_date)  # Extract MM/YYYY
             self.ids.month_input.text = default_month
             
             # Load transactions
@@ -31,146 +44,196 @@ class Monthly(Screen):
     
     def load_transactions(self):
         """
-        Load and display transactions for the specified month
+        Load and display transactions for the specified month.
+        The rows are built on a worker thread; a placeholder is shown until
+        they arrive, and a newer request replaces any load still running.
         """
         # Clear any existing content
-        for child in self.children[:]:
-            if isinstance(child, ScrollView):
-                self.remove_widget(child)
+        self.ids.transaction_list.data = []
         
         # Check if username exists
         if not self.current_username:
+            self.loader.cancel()
             self.display_no_transactions("No user logged in")
             return
         
         # Get the month to filter (expecting MM/YYYY format)
         filter_month = self.ids.month_input.text.strip()
+        if month_key(filter_month) is None:
+            self.loader.cancel()
+            self.display_no_transactions("Please enter a month in MM/YYYY format")
+            return
         
-        # Attempt to load transactions
-        try:
-            # Open user-specific transactions file
-            db_path = f'database/{self.current_username}_transactions.json'
-            db = TinyDB(db_path)
-            
-            # Filter transactions by month
-            transactions_by_date = defaultdict(list)
-            monthly_total = 0
-            
-            for transaction in db.all():
-                date = transaction.get('date', '')
-                if date:
-                    # Extract month/year from date (DD/MM/YYYY format)
-                    transaction_month = "/".join(date.split("/")[1:])
-                    if transaction_month == filter_month:
-                        transactions_by_date[date].append(transaction)
-                        monthly_total += transaction.get('amount', 0)
-            
-            # If no transactions
-            if not transactions_by_date:
-                self.display_no_transactions(f"No transactions found for {filter_month}")
-                return
-            
-            # Create scroll view
-            scroll_view = ScrollView(
-                size_hint=(0.5, 0.6),
-                pos_hint={'center_x': 0.3, 'center_y': 0.45},
-                bar_color=(0, 0, 0, 1),
-                bar_inactive_color=(0, 0, 0, 0),
-                bar_width="5dp"
-            )
-            
-            # Create layout for transactions
-            layout = BoxLayout(
-                orientation='vertical',
-                size_hint_y=None,
-                spacing=10,
-                padding=10
-            )
-            layout.bind(minimum_height=layout.setter('height'))
-            
-            # Month header
-            month_header = Label(
-                text=f"Transactions for {filter_month}",
-                size_hint_y=None,
-                height=50,
-                font_size='25sp',
-                color=(0, 0, 0, 1)
-            )
-            layout.add_widget(month_header)
-            
-            # Sort dates
-            sorted_dates = sorted(transactions_by_date.keys(), 
-                                key=lambda x: [int(i) for i in x.split("/")])
+        # Show a placeholder straight away
+        self.ids.transaction_list.data = [{
+            'text': "Loading...",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 0, 0, 1)
+        }]
+        
+        self.load_started = time.perf_counter()
+        self.loader.load(
+            partial(self.build_rows, self.current_username, filter_month),
+            self.show_rows,
+            self.show_load_error
+        )
+    
+    def build_rows(self, username, filter_month):
+        """
+        Returns the list rows for a month, from the store's query cache when
+        the month hasn't changed since it was last shown. Runs on a worker thread.
+        """
+        store = get_store(username)
+        return store.cache.get_or_compute(
+            ('month', month_key(filter_month), 'rows'),
+            partial(self.compute_rows, store, filter_month)
+        )
+    
+    @timed('monthly.compute_rows')
+    def compute_rows(self, store, filter_month):
+        """
+        Build the list rows for a month.
+        Returns a tuple (rows, message) - message is set when there is nothing to show.
+        """
+        # Only the month's transactions are read from the shared store
+        with timer('monthly.query'):
+            summary = month_summary(store, filter_month)
+        
+        # If no transactions
+        if not summary['days']:
+            return [], f"No transactions found for {filter_month}"
+        
+        # Build one row per line of the list; the RecycleView only
+        # creates labels for the rows currently on screen
+        rows = []
+        
+        # Month header
+        rows.append({
+            'text': f"Transactions for {filter_month}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 0, 0, 1)
+        })
+        
+        # Add transactions grouped by date, oldest first
+        for date, transactions, daily_total in summary['days']:
+            # Date header
+            rows.append({
+                'text': f"\nDate: {format_date(date)}",
+                'height': 40,
+                'font_size': '22sp',
+                'color': (0.2, 0.6, 0.8, 1)  # Blue color for date headers
+            })
             
-            # Add transactions grouped by date
-            for date in sorted_dates:
-                # Date header
-                date_header = Label(
-                    text=f"\nDate: {date}",
-                    size_hint_y=None,
-                    height=40,
-                    font_size='22sp',
-                    color=(0.2, 0.6, 0.8, 1)  # Blue color for date headers
-                )
-                layout.add_widget(date_header)
-                
-                # Daily total
-                daily_total = sum(t.get('amount', 0) for t in transactions_by_date[date])
-                
-                # Add transactions for this date
-                for transaction in transactions_by_date[date]:
-                    expense = transaction.get('expense', 'N/A')
-                    amount = transaction.get('amount', 0)
-                    
-                    transaction_label = Label(
-                        text=f"Expense: {expense}\nAmount: ₹{amount:.2f}",
-                        size_hint_y=None,
-                        height=70,
-                        font_size='20sp',
-                        color=(0, 0, 0, 1)
-                    )
-                    layout.add_widget(transaction_label)
+            # Add transactions for this date
+            for transaction in transactions:
+                expense = transaction.expense or 'N/A'
+                amount = transaction.paise
                 
-                # Add daily total
-                daily_total_label = Label(
-                    text=f"Daily Total: ₹{daily_total:.2f}\n",
-                    size_hint_y=None,
-                    height=40,
-                    font_size='20sp',
-                    color=(0.8, 0.4, 0, 1)  # Orange color for daily totals
-                )
-                layout.add_widget(daily_total_label)
+                rows.append({
+                    'text': f"Expense: {expense}\nAmount: ₹{format_amount(amount)}",
+                    'height': 70,
+                    'font_size': '20sp',
+                    'color': (0, 0, 0, 1)
+                })
             
-            # Monthly total footer
-            total_label = Label(
-                text=f"\nMonthly Total: ₹{monthly_total:.2f}",
-                size_hint_y=None,
-                height=50,
-                font_size='25sp',
-                color=(0, 1, 0, 1)  # Green text for monthly total
-            )
-            layout.add_widget(total_label)
-            
-            # Add layout to scroll view
-            scroll_view.add_widget(layout)
-            
-            # Add scroll view to screen
-            self.add_widget(scroll_view)
+            # Add daily total
+            rows.append({
+                'text': f"Daily Total: ₹{format_amount(daily_total)}\n",
+                'height': 40,
+                'font_size': '20sp',
+                'color': (0.8, 0.4, 0, 1)  # Orange color for daily totals
+            })
+        
+        # Biggest expenses of the month, grouped by name
+        rows.append({
+            'text': "\nTop Expenses",
+            'height': 40,
+            'font_size': '22sp',
+            'color': (0.2, 0.6, 0.8, 1)
+        })
+        for name, total in summary['top_expenses']:
+            rows.append({
+                'text': f"{name}: ₹{format_amount(total)}",
+                'height': 40,
+                'font_size': '20sp',
+                'color': (0, 0, 0, 1)
+            })
+        
+        # Monthly total footer
+        rows.append({
+            'text': f"\nMonthly Total: ₹{format_amount(summary['total'])}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 1, 0, 1)  # Green text for monthly total
+        })
+        
+        return rows, None
+    
+    def export_transactions(self):
+        """
+        Write the selected month's transactions to a CSV file in the exports folder
+        """
+        filter_month = self.ids.month_input.text.strip()
+        if not self.current_username:
+            self.display_no_transactions("No user logged in")
+            return
+        if month_key(filter_month) is None:
+            self.display_no_transactions("Please enter a month in MM/YYYY format")
+            return
         
-        except FileNotFoundError:
+        self.export_loader.load(
+            partial(export_month, self.current_username, filter_month),
+            self.show_export_done,
+            self.show_export_error
+        )
+    
+    def show_export_done(self, result):
+        """
+        Report where an export was written
+        """
+        path, count = result
+        self.display_no_transactions(f"Exported {count} transactions to {path}", (0, 0.6, 0, 1))
+    
+    def show_export_error(self, error):
+        """
+        Report an export that failed
+        """
+        print(f"Error exporting transactions: {error}")
+        self.display_no_transactions("Error exporting transactions")
+    
+    def show_rows(self, result):
+        """
+        Display the rows built by build_rows
+        """
+        rows, message = result
+        with timer('monthly.render', rows=len(rows)):
+            self.ids.transaction_list.data = rows
+        # From the button press to the rows being on screen
+        record('monthly.load', (time.perf_counter() - self.load_started) * 1000)
+        if message:
+            self.display_no_transactions(message)
+    
+    def show_load_error(self, error):
+        """
+        Display an error raised while loading transactions
+        """
+        self.ids.transaction_list.data = []
+        if isinstance(error, FileNotFoundError):
             self.display_no_transactions("No transactions file found")
-        except Exception as e:
-            print(f"Error loading transactions: {e}")
+        else:
+            print(f"Error loading transactions: {error}")
             self.display_no_transactions("Error loading transactions")
     
-    def display_no_transactions(self, message):
+    def display_no_transactions(self, message, color=(1, 0, 0, 1)):
         """
         Display a message when no transactions are found for 2 seconds, then disappear.
         """
         # Create and add a label for no transactions
         no_transactions_label = Label(
             text=message,
-            color=(1, 0, 0, 1),  # Red color
+            color=color,  # Red unless given
             font_size='25sp',
             size_hint=(1, 0.2),
             pos_hint={'center_x': 0.5, 'center_y': 0.5}
@@ -1,17 +1,21 @@
 from kivy.clock import Clock
 from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
-from tinydb import TinyDB, Query
-
-# Initialize TinyDB database
-db = TinyDB('database/users.json')
-User = Query()
+from functools import partial
+from core.accounts import get_accounts
+from core.loader import BackgroundLoader
 
 class Register(Screen):
 
+    def on_kv_post(self, base_widget):
+        # Passwords are hashed on a worker thread so the screen doesn't freeze
+        self.loader = BackgroundLoader()
+
     def register(self, username, password):
+        # One lookup in the account index, instead of a table scan per check
+        exists = get_accounts().exists(username)
 
-        if db.search(User.username == username) and len(password) < 8:
+        if exists and len(password) < 8:
             self.display_message("Username already exists & Password must be a minimum of 8 characters", (1, 0, 0, 1))  # Red color
         
         elif len(username) == 0 and len(password) == 0:
@@ -20,18 +24,32 @@ class Register(Screen):
         elif len(username) == 0:
             self.display_message("Username field cannot be empty", (1, 0, 0, 1))  # Red color
 
-        elif db.search(User.username == username):
+        elif exists:
             self.display_message("Username already exists!", (1, 0, 0, 1))  # Red color
 
         elif len(password) < 8:
             self.display_message("Password must be at least 8 characters!", (1, 0, 0, 1))  # Red color
 
         else:
-            # Save user credentials in TinyDB
-            db.insert({'username': username, 'password': password})
-            self.display_message("Registration successful!", (0, 1, 0, 1))  # Green color
-            # Redirect to the login screen after 3 seconds
-            Clock.schedule_once(lambda _: self.redirect_to_login(), 2)
+            # Save the user with a hashed password
+            self.loader.load(
+                partial(get_accounts().register, username, password),
+                self.finish_register,
+                self.show_register_error
+            )
+
+    def finish_register(self, result):
+        self.display_message("Registration successful!", (0, 1, 0, 1))  # Green color
+        # Redirect to the login screen after 3 seconds
+        Clock.schedule_once(lambda _: self.redirect_to_login(), 2)
+
+    def show_register_error(self, error):
+        if isinstance(error, ValueError):
+            # The username was taken while the password was being hashed
+            self.display_message(str(error), (1, 0, 0, 1))  # Red color
+        else:
+            print(f"Error registering user: {error}")
+            self.display_message("Registration failed", (1, 0, 0, 1))  # Red color
 
     def display_message(self, message, color):
         # Create a label to display feedback
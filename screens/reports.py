@@ -0,0 +1,208 @@
+from kivy.uix.screenmanager import Screen
+from kivy.uix.label import Label
+from kivy.clock import Clock
+from kivy.properties import StringProperty
+from functools import partial
+import time
+from core.dates import date_ordinal, format_date, format_month
+from core.ledger import range_report, period_range
+from core.loader import BackgroundLoader
+from core.metrics import timer, timed, record
+from core.money import format_amount
+from core.store import get_store
+
+class Reports(Screen):
+    current_username = StringProperty('')
+
+    def on_kv_post(self, base_widget):
+        """
+        Create the loader that builds reports off the main thread
+        """
+        self.loader = BackgroundLoader()
+
+    def on_enter(self):
+        """
+        Fetch the current username and show the year so far
+        """
+        try:
+            # Get username from login screen
+            self.current_username = self.manager.get_screen('login').username
+            if not self.ids.from_input.text:
+                self.show_period('year')
+            else:
+                self.load_report()
+        except Exception as e:
+            print(f"Error fetching username: {e}")
+            self.current_username = ''
+
+    def show_period(self, period):
+        """
+        Fill in the dates for a named period (see core.ledger.PERIODS) and
+        show its report
+        """
+        start, end = period_range(period)
+        self.ids.from_input.text = format_date(start)
+        self.ids.to_input.text = format_date(end)
+        self.load_report()
+
+    def load_report(self):
+        """
+        Load and display the report for the dates entered.
+        The rows are built on a worker thread; a placeholder is shown until
+        they arrive, and a newer request replaces any load still running.
+        """
+        # Clear any existing content
+        self.ids.transaction_list.data = []
+
+        # Check if username exists
+        if not self.current_username:
+            self.loader.cancel()
+            self.display_message("No user logged in")
+            return
+
+        start = date_ordinal(self.ids.from_input.text.strip())
+        end = date_ordinal(self.ids.to_input.text.strip())
+        if start is None or end is None:
+            self.loader.cancel()
+            self.display_message("Please enter dates in DD/MM/YYYY format")
+            return
+        if end < start:
+            self.loader.cancel()
+            self.display_message("The end date is before the start date")
+            return
+
+        # Show a placeholder straight away
+        self.ids.transaction_list.data = [{
+            'text': "Loading...",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 0, 0, 1)
+        }]
+
+        self.load_started = time.perf_counter()
+        self.loader.load(
+            partial(self.build_rows, self.current_username, start, end),
+            self.show_rows,
+            self.show_load_error
+        )
+
+    def build_rows(self, username, start, end):
+        """
+        Returns the list rows for a range, from the store's query cache when
+        nothing has been saved since it was last shown. Runs on a worker thread.
+        """
+        store = get_store(username)
+        # Dropped from the cache by a write to any date in range
+        return store.cache.get_or_compute(
+            ('range', (start, end), 'rows'),
+            partial(self.compute_rows, store, start, end)
+        )
+
+    @timed('reports.compute_rows')
+    def compute_rows(self, store, start, end):
+        """
+        Build the list rows for a range.
+        Returns a tuple (rows, message) - message is set when there is nothing to show.
+        """
+        report = range_report(store, start, end)
+        heading = f"{format_date(start)} to {format_date(end)}"
+
+        # If no transactions
+        if not report['count']:
+            return [], f"No transactions found from {heading}"
+
+        rows = []
+
+        # Report header
+        rows.append({
+            'text': f"Spending from {heading}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 0, 0, 1)
+        })
+        rows.append({
+            'text': f"{report['count']} transactions on {report['days']} days, "
+                    f"₹{format_amount(report['total'] / report['days'])} a day",
+            'height': 40,
+            'font_size': '20sp',
+            'color': (0, 0, 0, 1)
+        })
+
+        # Totals for each month in range
+        rows.append({
+            'text': "\nMonthly Totals",
+            'height': 40,
+            'font_size': '22sp',
+            'color': (0.2, 0.6, 0.8, 1)  # Blue color for section headers
+        })
+        for month, total in report['months']:
+            rows.append({
+                'text': f"{format_month(month)}: ₹{format_amount(total)}",
+                'height': 40,
+                'font_size': '20sp',
+                'color': (0, 0, 0, 1)
+            })
+
+        # Biggest expenses in range, grouped by name
+        rows.append({
+            'text': "\nTop Expenses",
+            'height': 40,
+            'font_size': '22sp',
+            'color': (0.2, 0.6, 0.8, 1)
+        })
+        for name, total in report['top_expenses']:
+            rows.append({
+                'text': f"{name}: ₹{format_amount(total)}",
+                'height': 40,
+                'font_size': '20sp',
+                'color': (0, 0, 0, 1)
+            })
+
+        # Total footer
+        rows.append({
+            'text': f"\nTotal: ₹{format_amount(report['total'])}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 1, 0, 1)  # Green text for total
+        })
+
+        return rows, None
+
+    def show_rows(self, result):
+        """
+        Display the rows built by build_rows
+        """
+        rows, message = result
+        with timer('reports.render', rows=len(rows)):
+            self.ids.transaction_list.data = rows
+        # From the button press to the rows being on screen
+        record('reports.load', (time.perf_counter() - self.load_started) * 1000)
+        if message:
+            self.display_message(message)
+
+    def show_load_error(self, error):
+        """
+        Display an error raised while building a report
+        """
+        self.ids.transaction_list.data = []
+        print(f"Error loading report: {error}")
+        self.display_message("Error loading report")
+
+    def display_message(self, message):
+        """
+        Display a message for 2 seconds, then remove it
+        """
+        message_label = Label(
+            text=message,
+            color=(1, 0, 0, 1),  # Red color
+            font_size='25sp',
+            size_hint=(1, 0.2),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5}
+        )
+        self.add_widget(message_label)
+
+        def remove_label(dt):
+            if message_label in self.children:
+                self.remove_widget(message_label)
+
+        Clock.schedule_once(remove_label, 2)
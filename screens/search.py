@@ -0,0 +1,186 @@
+from kivy.uix.screenmanager import Screen
+from kivy.uix.label import Label
+from kivy.clock import Clock
+from kivy.properties import StringProperty
+from functools import partial
+import time
+from core.dates import date_ordinal
+from core.ledger import search_expenses
+from core.loader import BackgroundLoader
+from core.metrics import timer, timed, record
+from core.models import expense_key
+from core.money import format_amount
+from core.store import get_store
+
+# Transactions listed under each matching name, newest first
+ROWS_PER_NAME = 20
+
+
+class Search(Screen):
+    current_username = StringProperty('')
+
+    def on_kv_post(self, base_widget):
+        """
+        Create the loader that runs searches off the main thread
+        """
+        self.loader = BackgroundLoader()
+
+    def on_enter(self):
+        """
+        Fetch the current username when entering the screen
+        """
+        try:
+            # Get username from login screen
+            self.current_username = self.manager.get_screen('login').username
+        except Exception as e:
+            print(f"Error fetching username: {e}")
+            self.current_username = ''
+
+    def load_results(self):
+        """
+        Search for the expense entered, between the dates if given.
+        The rows are built on a worker thread; a placeholder is shown until
+        they arrive, and a newer search replaces any still running.
+        """
+        # Clear any existing content
+        self.ids.transaction_list.data = []
+
+        # Check if username exists
+        if not self.current_username:
+            self.loader.cancel()
+            self.display_message("No user logged in")
+            return
+
+        query = self.ids.search_input.text.strip()
+        if not query:
+            self.loader.cancel()
+            self.display_message("Please enter an expense to search for")
+            return
+
+        # Either date may be left empty to search from the start or to the end
+        bounds = []
+        for date in (self.ids.from_input.text.strip(), self.ids.to_input.text.strip()):
+            ordinal = date_ordinal(date) if date else None
+            if date and ordinal is None:
+                self.loader.cancel()
+                self.display_message("Please enter dates in DD/MM/YYYY format")
+                return
+            bounds.append(ordinal)
+        start, end = bounds
+        if start is not None and end is not None and end < start:
+            self.loader.cancel()
+            self.display_message("The end date is before the start date")
+            return
+
+        # Show a placeholder straight away
+        self.ids.transaction_list.data = [{
+            'text': "Searching...",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 0, 0, 1)
+        }]
+
+        self.load_started = time.perf_counter()
+        self.loader.load(
+            partial(self.build_rows, self.current_username, query, start, end),
+            self.show_rows,
+            self.show_load_error
+        )
+
+    def build_rows(self, username, query, start, end):
+        """
+        Returns the list rows for a search, from the store's query cache
+        when nothing has been saved since it was last shown. Runs on a
+        worker thread.
+        """
+        store = get_store(username)
+        # Dropped from the cache by a write to any date in range
+        return store.cache.get_or_compute(
+            ('search', (start, end), expense_key(query), 'rows'),
+            partial(self.compute_rows, store, query, start, end)
+        )
+
+    @timed('search.compute_rows')
+    def compute_rows(self, store, query, start, end):
+        """
+        Build the list rows for a search.
+        Returns a tuple (rows, message) - message is set when there is nothing to show.
+        """
+        results = search_expenses(store, query, start, end, rows=ROWS_PER_NAME)
+
+        # If nothing matches
+        if not results['matches']:
+            return [], f"No expenses found matching '{query}'"
+
+        rows = []
+        for match in results['matches']:
+            # Name header, with its total over the dates searched
+            rows.append({
+                'text': f"\n{match['name']}: ₹{format_amount(match['total'])} ({match['count']} transactions)",
+                'height': 40,
+                'font_size': '22sp',
+                'color': (0.2, 0.6, 0.8, 1)  # Blue color for headers
+            })
+            for transaction in match['transactions']:
+                rows.append({
+                    'text': f"{transaction.date}: ₹{format_amount(transaction.paise)}",
+                    'height': 40,
+                    'font_size': '20sp',
+                    'color': (0, 0, 0, 1)
+                })
+            if match['count'] > len(match['transactions']):
+                rows.append({
+                    'text': f"... and {match['count'] - len(match['transactions'])} earlier",
+                    'height': 40,
+                    'font_size': '18sp',
+                    'color': (0, 0, 0, 1)
+                })
+
+        # Total footer
+        rows.append({
+            'text': f"\nTotal: ₹{format_amount(results['total'])}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 1, 0, 1)  # Green text for total
+        })
+
+        return rows, None
+
+    def show_rows(self, result):
+        """
+        Display the rows built by build_rows
+        """
+        rows, message = result
+        with timer('search.render', rows=len(rows)):
+            self.ids.transaction_list.data = rows
+        # From the button press to the rows being on screen
+        record('search.load', (time.perf_counter() - self.load_started) * 1000)
+        if message:
+            self.display_message(message)
+
+    def show_load_error(self, error):
+        """
+        Display an error raised while searching
+        """
+        self.ids.transaction_list.data = []
+        print(f"Error searching: {error}")
+        self.display_message("Error searching transactions")
+
+    def display_message(self, message):
+        """
+        Display a message for 2 seconds, then remove it
+        """
+        message_label = Label(
+            text=message,
+            color=(1, 0, 0, 1),  # Red color
+            font_size='25sp',
+            size_hint=(1, 0.2),
+            pos_hint={'center_x': 0.5, 'center_y': 0.5}
+        )
+        self.add_widget(message_label)
+
+        def remove_label(dt):
+            if message_label in self.children:
+                self.remove_widget(message_label)
+
+        Clock.schedule_once(remove_label, 2)
@@ -1,14 +1,25 @@
 from kivy.uix.screenmanager import Screen
-from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
-from kivy.uix.scrollview import ScrollView
-from tinydb import TinyDB
 from kivy.clock import Clock
 from kivy.properties import StringProperty
+from functools import partial
+import time
+from core.ledger import day_transactions
+from core.loader import BackgroundLoader
+from core.metrics import timer, timed, record
+from core.money import format_amount
+from core.dates import date_ordinal
+from core.store import get_store
 
 class View(Screen):
     current_username = StringProperty('')
     
+    def on_kv_post(self, base_widget):
+        """
+        Create the loader that reads transactions off the main thread
+        """
+        self.loader = BackgroundLoader()
+    
     def on_enter(self):
         """
         Fetch the current username and default date for transactions
@@ -29,99 +40,121 @@ class View(Screen):
     
     def load_transactions(self):
         """
-        Load and display transactions for the specified date
+        Load and display transactions for the specified date.
+        The rows are built on a worker thread; a placeholder is shown until
+        they arrive, and a newer request replaces any load still running.
         """
         # Clear any existing content
-        for child in self.children[:]:
-            if isinstance(child, ScrollView):
-                self.remove_widget(child)
+        self.ids.transaction_list.data = []
         
         # Check if username exists
         if not self.current_username:
+            self.loader.cancel()
             self.display_no_transactions("No user logged in")
             return
         
         # Get the date to filter
         filter_date = self.ids.date_input.text.strip()
+        if date_ordinal(filter_date) is None:
+            self.loader.cancel()
+            self.display_no_transactions("Please enter a date in DD/MM/YYYY format")
+            return
         
-        # Attempt to load transactions
-        try:
-            # Open user-specific transactions file
-            db_path = f'database/{self.current_username}_transactions.json'
-            db = TinyDB(db_path)
-            
-            # Filter transactions by date
-            transactions = [t for t in db.all() if t.get('date') == filter_date]
-            
-            # If no transactions
-            if not transactions:
-                self.display_no_transactions(f"No transactions found for {filter_date}")
-                return
-            
-            # Create scroll view
-            scroll_view = ScrollView(
-                size_hint=(0.5, 0.6),
-                pos_hint={'center_x': 0.3, 'center_y': 0.45},
-                bar_color = (0,0,0,1),
-                bar_inactive_color = (0,0,0,0),
-                bar_width = "5dp"
-            )
-            
-            # Create layout for transactions
-            layout = BoxLayout(
-                orientation='vertical',
-                size_hint_y=None,
-                spacing=10,
-                padding=10
-            )
-            layout.bind(minimum_height=layout.setter('height'))
-            
-            # Date header
-            date_header = Label(
-                text=f"Transactions on {filter_date}",
-                size_hint_y=None,
-                height=50,
-                font_size='25sp',
-                color=(0,0,0,1)
-            )
-            layout.add_widget(date_header)
-            
-            # Add transactions to layout
-            total_amount = 0
-            for transaction in transactions:
-                expense = transaction.get('expense', 'N/A')
-                amount = transaction.get('amount', 0)
-                total_amount += amount
-                
-                transaction_label = Label(
-                    text=f"Expense: {expense}\nAmount: ₹{amount:.2f}",
-                    size_hint_y=None,
-                    height=70,
-                    font_size='20sp',
-                    color=(0,0,0,1)
-                )
-                layout.add_widget(transaction_label)
-            
-            # Total amount footer
-            total_label = Label(
-                text=f"Total Expenses: ₹{total_amount:.2f}",
-                size_hint_y=None,
-                height=50,
-                font_size='25sp',
-                color=(0, 1, 0, 1)  # Green text for total
-            )
-            layout.add_widget(total_label)
-            
-            # Add layout to scroll view
-            scroll_view.add_widget(layout)
+        # Show a placeholder straight away
+        self.ids.transaction_list.data = [{
+            'text': "Loading...",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0,0,0,1)
+        }]
+        
+        self.load_started = time.perf_counter()
+        self.loader.load(
+            partial(self.build_rows, self.current_username, filter_date),
+            self.show_rows,
+            self.show_load_error
+        )
+    
+    def build_rows(self, username, filter_date):
+        """
+        Returns the list rows for a date, from the store's query cache when
+        the date hasn't changed since it was last shown. Runs on a worker thread.
+        """
+        store = get_store(username)
+        return store.cache.get_or_compute(
+            ('date', date_ordinal(filter_date), 'rows'),
+            partial(self.compute_rows, store, filter_date)
+        )
+    
+    @timed('view.compute_rows')
+    def compute_rows(self, store, filter_date):
+        """
+        Build the list rows for a date.
+        Returns a tuple (rows, message) - message is set when there is nothing to show.
+        """
+        # Look up the date in the user's shared transaction store
+        with timer('view.query'):
+            transactions, total_amount = day_transactions(store, filter_date)
+        
+        # If no transactions
+        if not transactions:
+            return [], f"No transactions found for {filter_date}"
+        
+        # Build one row per line of the list; the RecycleView only
+        # creates labels for the rows currently on screen
+        rows = []
+        
+        # Date header
+        rows.append({
+            'text': f"Transactions on {filter_date}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0,0,0,1)
+        })
+        
+        # Add transactions to the list
+        for transaction in transactions:
+            expense = transaction.expense or 'N/A'
+            amount = transaction.paise
             
-            # Add scroll view to screen
-            self.add_widget(scroll_view)
+            rows.append({
+                'text': f"Expense: {expense}\nAmount: ₹{format_amount(amount)}",
+                'height': 70,
+                'font_size': '20sp',
+                'color': (0,0,0,1)
+            })
         
-        except FileNotFoundError:
+        # Total amount footer
+        rows.append({
+            'text': f"Total Expenses: ₹{format_amount(total_amount)}",
+            'height': 50,
+            'font_size': '25sp',
+            'color': (0, 1, 0, 1)  # Green text for total
+        })
+        
+        return rows, None
+    
+    def show_rows(self, result):
+        """
+        Display the rows built by build_rows
+        """
+        rows, message = result
+        with timer('view.render', rows=len(rows)):
+            self.ids.transaction_list.data = rows
+        # From the button press to the rows being on screen
+        record('view.load', (time.perf_counter() - self.load_started) * 1000)
+        if message:
+            self.display_no_transactions(message)
+    
+    def show_load_error(self, error):
+        """
+        Display an error raised while loading transactions
+        """
+        self.ids.transaction_list.data = []
+        if isinstance(error, FileNotFoundError):
             self.display_no_transactions("No transactions file found")
-        except Exception as e:
-            print(f"Error loading transactions: {e}")
+        else:
+            print(f"Error loading transactions: {error}")
             self.display_no_transactions("Error loading transactions")
     
     def display_no_transactions(self, message):